@@ -0,0 +1,208 @@
+import pygame
+import threading
+from collections import OrderedDict
+
+from resources import open_resource
+
+FONT_PATH = "assets/ByteBounce.ttf"
+
+
+class AssetCache:
+    """
+    Shared cache for images, fonts and sounds loaded from disk.
+    Entries are keyed by (path, size, scale, alpha) and evicted least-recently-used
+    once the estimated memory use goes over `budget` bytes.
+    """
+
+    def __init__(self, budget=64 * 1024 * 1024):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (asset, cost in bytes)
+        self._lock = threading.Lock()  # the startup loader fills the cache from its own thread
+
+    def _get(self, key, loader, cost):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # load outside the lock so other threads aren't blocked on a decode;
+        # if two threads miss the same key at once the later result wins
+        asset = loader()
+        size = cost(asset)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.used -= previous[1]
+            self._entries[key] = (asset, size)
+            self.used += size
+            self._evict()
+        return asset
+
+    def _evict(self):
+        # always keep the newest entry, even if it alone is over budget
+        while self.used > self.budget and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.used -= size
+
+    def image(self, path, size=None, scale=None, alpha=True, smooth=False, cache_source=True):
+        """ Returns the image at `path`, optionally resized to `size` (w, h) or by `scale`.
+        Pass `cache_source=False` for large images that are only ever shown resized.
+        """
+        key = ("image", path, size, scale, alpha, smooth)
+
+        def load():
+            if size is None and scale is None:
+                image = load_image(path)
+                return image.convert_alpha() if alpha else image.convert()
+
+            if cache_source:
+                base = self.image(path, alpha=alpha)
+            else:
+                base = load_image(path)
+            if size is not None:
+                target = (int(size[0]), int(size[1]))
+            else:
+                target = (int(base.get_width() * scale), int(base.get_height() * scale))
+            if smooth:
+                image = pygame.transform.smoothscale(base, target)
+            else:
+                image = pygame.transform.scale(base, target)
+            if not cache_source:
+                image = image.convert_alpha() if alpha else image.convert()
+            return image
+
+        return self._get(key, load, _surface_cost)
+
+    def cached_image(self, path, size=None, scale=None, alpha=True, smooth=False):
+        """ Returns the image if it is already cached, otherwise None (never touches the disk). """
+        key = ("image", path, size, scale, alpha, smooth)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put_image(self, surface, path, size=None, scale=None, alpha=True, smooth=False):
+        """ Stores an image that was loaded elsewhere (e.g. on a worker thread) in the cache. """
+        key = ("image", path, size, scale, alpha, smooth)
+        cost = _surface_cost(surface)
+        with self._lock:
+            if key in self._entries:
+                self.used -= self._entries.pop(key)[1]
+            self._entries[key] = (surface, cost)
+            self.used += cost
+            self._evict()
+
+    def font(self, size, path=FONT_PATH):
+        """ Returns a pygame Font for `path` at point size `size`. """
+        size = int(size)
+        return self._get(("font", path, size, None, None),
+                         lambda: pygame.font.Font(open_resource(path), size),  # font keeps the file open
+                         lambda font: 64 * 1024)
+
+    def sound(self, path):
+        """ Returns a decoded pygame Sound for `path`. """
+        return self._get(("sound", path, None, None, None),
+                         lambda: load_sound(path),
+                         _sound_cost)
+
+    def text(self, text, size, colour, antialias=True, bg=None, path=FONT_PATH):
+        """ Returns a pre-rendered surface for `text`; only rasterized the first time it is asked for. """
+        key = ("text", path, int(size), text, tuple(colour), antialias, bg and tuple(bg))
+
+        def render():
+            surface = self.font(size, path).render(text, antialias, colour, bg)
+            return surface.convert_alpha() if pygame.display.get_surface() else surface
+
+        return self._get(key, render, _surface_cost)
+
+    def glyphs(self, size, colour, antialias=True, path=FONT_PATH):
+        """ Returns the GlyphAtlas used to compose frequently changing text such as counters. """
+        key = ("glyphs", path, int(size), tuple(colour), antialias)
+        return self._get(key, lambda: GlyphAtlas(self.font(size, path), colour, antialias),
+                         lambda atlas: 16 * 1024)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used = 0
+
+    def stats(self):
+        """ Returns hit/miss counters and memory use. """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "used": self.used,
+            "budget": self.budget,
+        }
+
+
+class GlyphAtlas:
+    """
+    Per-glyph surfaces for one font, size and colour. Strings are drawn by blitting
+    the glyphs side by side, so a changing number never has to be re-rasterized.
+    """
+
+    def __init__(self, font, colour, antialias=True):
+        self.font = font
+        self.colour = colour
+        self.antialias = antialias
+        self.height = font.get_height()
+        self._glyphs = {}  # char -> (surface, advance)
+
+    def glyph(self, char):
+        entry = self._glyphs.get(char)
+        if entry is None:
+            surface = self.font.render(char, self.antialias, self.colour)
+            entry = (surface, self.font.size(char)[0])
+            self._glyphs[char] = entry
+        return entry
+
+    def size(self, text):
+        """ Returns the (width, height) `text` takes up when drawn. """
+        return sum(self.glyph(char)[1] for char in text), self.height
+
+    def draw(self, surface, text, pos):
+        """ Draws `text` with its top-left corner at `pos` and returns the rect covered. """
+        x, y = pos
+        for char in text:
+            glyph, advance = self.glyph(char)
+            surface.blit(glyph, (x, y))
+            x += advance
+        return pygame.Rect(pos[0], y, x - pos[0], self.height)
+
+
+def load_image(path):
+    """ Decodes an image resource (loose file or bundle entry), unconverted. """
+    with open_resource(path) as f:
+        return pygame.image.load(f, path)
+
+
+def load_sound(path):
+    """ Decodes a sound resource (loose file or bundle entry). """
+    with open_resource(path) as f:
+        return pygame.mixer.Sound(file=f)
+
+
+def _surface_cost(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+def _sound_cost(sound):
+    init = pygame.mixer.get_init()
+    if not init:
+        return 0
+    frequency, bits, channels = init
+    return int(sound.get_length() * frequency * channels * abs(bits) // 8)
+
+
+assets = AssetCache()
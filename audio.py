@@ -0,0 +1,121 @@
+import pygame
+import threading, time
+
+from asset_cache import load_sound
+from resources import open_resource
+
+SOUNDS = {
+    "click": "assets/sounds/90s-game-ui-6-185099.wav",
+    "correct": "assets/sounds/90s-game-ui-11-185104.wav",
+    "wrong": "assets/sounds/classic-game-action-negative-5-224417.wav",
+    "points": "assets/sounds/get-coin-351945.wav",
+}
+MUSIC = {
+    "theme": "assets/sounds/soulomon-b-the-yume-collective-midnight-miracles-436039.mp3",
+}
+
+# effect -> pool; each pool gets its own reserved channels so a burst of clicks
+# can never cut off the answer feedback
+POOLS = {"ui": 2, "feedback": 2}
+EFFECT_POOLS = {"click": "ui", "correct": "feedback", "wrong": "feedback", "points": "feedback"}
+CROSSFADE_MS = 800
+
+
+class AudioManager:
+    """
+    Sound effects decoded once into a bank and played on reserved channel pools,
+    plus streamed music that fades between tracks. Every call returns immediately
+    and quietly does nothing until `load()` has run (or if there is no mixer), so
+    screens can play sounds without caring whether audio is available.
+    """
+
+    def __init__(self, sounds=SOUNDS, music=MUSIC, pools=POOLS, effect_pools=EFFECT_POOLS):
+        self.sounds = sounds
+        self.music = music
+        self.pools = pools
+        self.effect_pools = effect_pools
+        self.bank = {}  # effect name -> Sound
+        self._channels = {}  # pool -> [Channel, ...]
+        self._started = {}  # Channel id -> time.monotonic() its voice started, for stealing
+        self._lock = threading.Lock()  # load() runs on the startup loader thread
+        self.track = None  # music currently playing (or fading in)
+        self._next_track = None  # (name, loops) waiting for the fade-out to finish
+        self._switch_at = 0.0
+
+    @property
+    def ready(self):
+        return bool(self.bank)
+
+    def load(self):
+        """ Decodes every effect and reserves the channel pools. Needs the mixer to be initialized. """
+        if not pygame.mixer.get_init():
+            return
+        reserved = sum(self.pools.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved + 4))
+        pygame.mixer.set_reserved(reserved)  # Sound.play() elsewhere won't take pool channels
+
+        channels, next_id = {}, 0
+        for pool, count in self.pools.items():
+            channels[pool] = [pygame.mixer.Channel(next_id + i) for i in range(count)]
+            next_id += count
+        bank = {name: load_sound(path) for name, path in self.sounds.items()}
+        with self._lock:
+            self._channels = channels
+            self.bank = bank
+
+    def _channel(self, pool):
+        """ A free channel from `pool`, or the one whose voice has played the longest. """
+        channels = self._channels[pool]
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        return min(channels, key=lambda c: self._started.get(id(c), 0.0))
+
+    def play(self, name):
+        """ Plays effect `name` (e.g. "click"); None is ignored. Returns the Channel used, if any. """
+        if name is None:
+            return None
+        with self._lock:
+            sound = self.bank.get(name)
+            if sound is None:
+                return None
+            channel = self._channel(self.effect_pools.get(name, "ui"))
+            channel.play(sound)
+            self._started[id(channel)] = time.monotonic()
+        return channel
+
+    def play_music(self, name, loops=-1, fade_ms=CROSSFADE_MS):
+        """
+        Switches the music to track `name`. If something is already playing it fades
+        out first and the new track fades in on a later `update()`, so this never blocks.
+        """
+        if not pygame.mixer.get_init() or name == self.track:
+            return
+        if self.track is None or not pygame.mixer.music.get_busy():
+            self._start_track(name, loops, fade_ms)
+            return
+        pygame.mixer.music.fadeout(fade_ms)
+        self._next_track = (name, loops)
+        self._switch_at = time.monotonic() + fade_ms / 1000
+
+    def _start_track(self, name, loops, fade_ms):
+        path = self.music[name]
+        pygame.mixer.music.load(open_resource(path), path)  # streamed, not decoded up front
+        pygame.mixer.music.play(loops, fade_ms=fade_ms if self.track else 0)
+        self.track = name
+        self._next_track = None
+
+    def update(self):
+        """ Call once a frame: starts a queued track once the previous one has faded out. """
+        if self._next_track and time.monotonic() >= self._switch_at:
+            name, loops = self._next_track
+            self._start_track(name, loops, CROSSFADE_MS)
+
+    def wake_in(self):
+        """ Milliseconds until `update()` has work to do, or None. """
+        if not self._next_track:
+            return None
+        return max(0, int((self._switch_at - time.monotonic()) * 1000))
+
+
+audio = AudioManager()
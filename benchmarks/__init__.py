@@ -0,0 +1,8 @@
+"""
+Headless benchmarks for every screen and the hot paths behind them.
+
+    SDL_VIDEODRIVER=dummy SDL_AUDIODRIVER=dummy python -m benchmarks [--output results.json]
+
+Results are written as JSON and checked against benchmarks/thresholds.json;
+any metric outside its threshold makes the run exit with status 1.
+"""
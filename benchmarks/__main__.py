@@ -0,0 +1,64 @@
+from benchmarks import harness  # sets the dummy SDL drivers before pygame initializes
+
+import argparse, json, os, sys
+
+from benchmarks.cases import CASES, Context
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def check(results, thresholds):
+    """ Returns a list of human-readable threshold failures. """
+    failures = []
+    for name, limits in thresholds.items():
+        metrics = results.get(name, {})
+        for metric, bounds in limits.items():
+            value = metrics.get(metric)
+            if value is None:
+                continue
+            if "min" in bounds and value < bounds["min"]:
+                failures.append(f"{name}.{metric} = {value:.2f} (min {bounds['min']})")
+            if "max" in bounds and value > bounds["max"]:
+                failures.append(f"{name}.{metric} = {value:.2f} (max {bounds['max']})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Headless screen and hot-path benchmarks.")
+    parser.add_argument("--output", help="write results to this JSON file (default: stdout)")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="JSON file of min/max limits per metric")
+    parser.add_argument("--frames", type=int, default=300, help="frames to drive each screen for")
+    parser.add_argument("--only", action="append", help="run only benchmarks whose name starts with this")
+    args = parser.parse_args(argv)
+
+    ctx = Context(args.frames)
+    results = {}
+    try:
+        for name, fn in CASES.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            try:
+                results[name] = fn(ctx)
+            except FileNotFoundError as e: # level data isn't checked in everywhere
+                results[name] = {"skipped": str(e)}
+            print(f"{name}: {results[name]}", file=sys.stderr)
+    finally:
+        ctx.close()
+
+    with open(args.thresholds) as f:
+        failures = check(results, json.load(f))
+    report = {"results": results, "failures": failures}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
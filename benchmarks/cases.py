@@ -0,0 +1,169 @@
+from benchmarks.harness import SyntheticInput, time_per_op, key_event
+
+import pygame
+import os, tempfile
+
+import game
+from game import load_game, GameState, create_surface_with_text
+from challenges import TextInput, load_city_levels, osint_level_page, OSINTLevel
+from level_grid import LevelGrid
+from ui_input import UIInput
+from screens import title_screen, play_level, portland_screen, eugene_screen, corvallis_screen
+
+CASES = {}
+
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """ Shared state for one benchmark run: the display, a throwaway progress database and a player. """
+
+    def __init__(self, frames):
+        self.frames = frames
+        pygame.init()
+        self.screen = pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+        self._tmp = tempfile.TemporaryDirectory()
+        game.SAVE_PATH = os.path.join(self._tmp.name, "save_data.json")  # never touch the real save
+        game.DB_PATH = os.path.join(self._tmp.name, "progress.db")
+        self.player = load_game()
+        self.player.name = "Benchmark"
+
+    def close(self):
+        self.player.flush()
+        self.player.close()
+        self._tmp.cleanup()
+
+
+def run_screen(ctx, screen_fn, *args, frame_events=None):
+    synthetic = SyntheticInput(ctx.frames, frame_events)
+    with synthetic.installed():
+        result = screen_fn(ctx.screen, *args)
+    if result != GameState.QUIT:
+        raise RuntimeError(f"{screen_fn.__name__} left the screen early ({result})")
+    return synthetic.results()
+
+
+@case("screen.title_screen")
+def bench_title_screen(ctx):
+    return run_screen(ctx, title_screen, None)
+
+
+@case("screen.play_level")
+def bench_play_level(ctx):
+    return run_screen(ctx, play_level, ctx.player, None)
+
+
+@case("screen.portland_screen")
+def bench_portland_screen(ctx):
+    return run_screen(ctx, portland_screen, ctx.player, None)
+
+
+@case("screen.eugene_screen")
+def bench_eugene_screen(ctx):
+    return run_screen(ctx, eugene_screen, ctx.player, None)
+
+
+@case("screen.corvallis_screen")
+def bench_corvallis_screen(ctx):
+    return run_screen(ctx, corvallis_screen, ctx.player, None)
+
+
+@case("screen.osint_level_page")
+def bench_osint_level_page(ctx):
+    level = load_city_levels("portland")[0]
+    text = "44.0175976,-123.9408846"
+
+    def typing(frame): # click into the box, then type a character every few frames
+        if frame == 0:
+            return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(600, 300))]
+        if frame % 5 == 0:
+            return [key_event(text[(frame // 5) % len(text)])]
+        return []
+
+    return run_screen(ctx, osint_level_page, level, None, "portland", ctx.player, frame_events=typing)
+
+
+@case("player.check_levels")
+def bench_check_levels(ctx):
+    return {"us_per_op": time_per_op(lambda: ctx.player.check_levels(3, "portland"), 100000)}
+
+
+@case("player.save_game")
+def bench_save_game(ctx):
+    def save():
+        ctx.player.points += 1
+        ctx.player.save_game()
+    queued = time_per_op(save, 10000)
+    flushed = time_per_op(lambda: (ctx.player.save_game(), ctx.player.flush()), 100)
+    return {"us_per_op": queued, "flush_us_per_op": flushed}
+
+
+@case("textinput.edit")
+def bench_textinput(ctx):
+    box = TextInput(pygame.Rect(530, 280, 210, 40))
+    box.active = True
+    keys = [[key_event(c)] for c in "44.0175976,-123.9408846" * 8]
+    clicks = [[pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(530 + x, 300))] for x in range(0, 210, 7)]
+
+    def edit():
+        box.text = ""
+        box.cursor_pos = 0
+        for events in keys:
+            box.update(events)
+            box.draw(ctx.screen)
+
+    def click():
+        for events in clicks:
+            box.update(events)
+
+    return {
+        "us_per_keystroke": time_per_op(edit, 20) / len(keys),
+        "us_per_click": time_per_op(click, 200) / len(clicks),
+    }
+
+
+@case("create_surface_with_text")
+def bench_create_surface_with_text(ctx):
+    return {"us_per_op": time_per_op(lambda: create_surface_with_text("<--- Return to menu", 20, (255, 255, 255)), 10000)}
+
+
+@case("load_city_levels")
+def bench_load_city_levels(ctx):
+    return {"us_per_op": time_per_op(lambda: load_city_levels("portland"), 200)}
+
+
+@case("level_grid.scroll_1000")
+def bench_level_grid(ctx):
+    levels = [OSINTLevel("portland", i) for i in range(1, 1001)] # mostly without icon art
+    grid = LevelGrid(levels)
+    small = LevelGrid(load_city_levels("portland"))
+    offsets = iter(range(0, 10 ** 9, 37))
+
+    def scroll():
+        grid.scroll_to(next(offsets) % (grid.max_scroll + 1))
+        grid.draw(ctx.screen)
+
+    return {
+        "us_per_frame": time_per_op(scroll, 500),
+        "us_per_frame_5_levels": time_per_op(lambda: small.draw(ctx.screen), 500),
+        "us_per_hit_test": time_per_op(lambda: grid.index_at((430, 300)), 100000),
+    }
+
+
+@case("ui_input.hover_400")
+def bench_ui_input(ctx):
+    buttons = [game.Button(x, y, "assets/level_icons/lock.png", size=(30, 30), action=(x, y))
+               for x in range(0, 800, 40) for y in range(0, 600, 30)]
+    ui = UIInput(buttons)
+    path = iter([(x % 800, (x * 7) % 600) for x in range(10 ** 6)])
+
+    return {
+        "buttons": len(buttons),
+        "us_per_move": time_per_op(lambda: ui.update([], next(path)), 20000),
+        "us_per_still_frame": time_per_op(lambda: ui.update([], (400, 300)), 100000),
+    }
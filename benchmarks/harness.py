@@ -0,0 +1,105 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import math, time, tracemalloc
+from contextlib import contextmanager
+
+
+class FastClock:
+    """ Stand-in for pygame.time.Clock that never sleeps, so screens run flat out. """
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def tick(self, framerate=0):
+        now = time.perf_counter()
+        elapsed = int((now - self._last) * 1000)
+        self._last = now
+        return elapsed
+
+    def get_fps(self):
+        return 0.0
+
+
+class SyntheticInput:
+    """
+    Replaces pygame's event queue and mouse state with a scripted stream.
+    Each call to pygame.event.get() is one frame: the pointer moves along a circle,
+    `frame_events(i)` can add events, and after `frames` frames a QUIT is sent.
+    Also records per-frame Python allocation high-water marks with tracemalloc.
+    """
+
+    def __init__(self, frames, frame_events=None, center=(400, 300), radius=250):
+        self.frames = frames
+        self.frame_events = frame_events
+        self.center = center
+        self.radius = radius
+        self.frame = 0
+        self.pos = center
+        self.frame_times = []
+        self.frame_allocs = []
+        self._last = None
+
+    def _get(self, *args, **kwargs):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.frame_times.append(now - self._last)
+            current, peak = tracemalloc.get_traced_memory()
+            self.frame_allocs.append(max(0, peak - self._alloc_base))
+        self._last = now
+        tracemalloc.reset_peak()
+        self._alloc_base = tracemalloc.get_traced_memory()[0]
+
+        if self.frame >= self.frames:
+            return [pygame.event.Event(pygame.QUIT)]
+        angle = self.frame / 30 * math.pi
+        self.pos = (int(self.center[0] + self.radius * math.cos(angle)),
+                    int(self.center[1] + self.radius * math.sin(angle)))
+        events = [pygame.event.Event(pygame.MOUSEMOTION, pos=self.pos, rel=(0, 0), buttons=(0, 0, 0))]
+        if self.frame_events:
+            events += self.frame_events(self.frame)
+        self.frame += 1
+        return events
+
+    @contextmanager
+    def installed(self):
+        saved = pygame.event.get, pygame.event.wait, pygame.mouse.get_pos, pygame.mouse.get_pressed, pygame.time.Clock
+        pygame.event.get = self._get
+        pygame.event.wait = lambda timeout=0: pygame.event.Event(pygame.NOEVENT) # never idle
+        pygame.mouse.get_pos = lambda: self.pos
+        pygame.mouse.get_pressed = lambda num_buttons=3: (False,) * num_buttons
+        pygame.time.Clock = FastClock
+        tracemalloc.start()
+        try:
+            yield self
+        finally:
+            tracemalloc.stop()
+            pygame.event.get, pygame.event.wait, pygame.mouse.get_pos, pygame.mouse.get_pressed, pygame.time.Clock = saved
+
+    def results(self):
+        times = sorted(self.frame_times)
+        if not times:
+            return {}
+        allocs = sorted(self.frame_allocs)
+        return {
+            "frames": len(times),
+            "fps": len(times) / sum(times),
+            "frame_ms_p50": times[len(times) // 2] * 1000,
+            "frame_ms_p95": times[min(len(times) - 1, int(len(times) * 0.95))] * 1000,
+            "alloc_kb_p50": allocs[len(allocs) // 2] / 1024,
+            "alloc_kb_max": allocs[-1] / 1024,
+        }
+
+
+def time_per_op(fn, repeat=1000):
+    """ Runs `fn` `repeat` times and returns microseconds per call. """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def key_event(char):
+    return pygame.event.Event(pygame.KEYDOWN, key=0, unicode=char, mod=0)
@@ -1,4 +1,14 @@
-import pygame, shutil, os, pyperclip, time
+import pygame
+from bisect import bisect_right
+from asset_cache import assets
+from prefetch import ImagePrefetcher
+from export import exports
+from audio import audio
+import image_cache
+from grading import distance_to_answer, allowed_error_m
+from levels import OSINTLevel, registry
+from scenes import Scene, run_scene
+from ui_input import UIInput
 # from pygame.sprite import Sprite
 
 WHITE = (255, 255, 255)
@@ -6,48 +16,73 @@ BLACK = (0, 0, 0)
 GRAY = (120, 120, 120)
 GREEN = (0, 200, 0)
 
-point_vals = {1:1000, 2:1500, 3:2000, 4:3000, 5:5000}
+CURSOR_BLINK_MS = 333 # same as the old 20 frames at 60 fps
 
-class OSINTLevel:
-    """
-    Represents a single OSINT challenge.
-    Holds image path + str answer array.
-    """
-    def __init__(self, city, level_id):
-        if city not in ["portland", "eugene", "corvallis"]:
-            raise ValueError("Invalid city name")
-        self.city = city
-        self.level_id = level_id
-        self.image_path = f"osint_levels/{city}/{level_id}/{level_id}.jpg"
-        self.answer = self.load_solution(city, level_id)
-
-    def load_solution(self, city, level_id):
-        with open(f"osint_levels/{city}/{level_id}/{level_id}.txt", "r") as f:
-            lat, lon = f.readline().strip().split(",")
-        return [lat, lon]
+LEVEL_IMAGE_SIZE = image_cache.DISPLAY_SIZE
+level_images = ImagePrefetcher(LEVEL_IMAGE_SIZE) # decodes level images off the UI thread
 
+# screen regions redrawn by OSINTLevelScene when their contents change
+LEVEL_IMAGE_RECT = pygame.Rect((50, 80), LEVEL_IMAGE_SIZE)
+RESULT_RECT = pygame.Rect(0, 0, 64, 64).move(640 - 32, 450 - 32)
+POINTS_RECT = pygame.Rect(0, 0, 80, 24).move(705 - 40, 45 - 12)
+DOWNLOAD_MSG_RECT = pygame.Rect(0, 0, 460, 20).move(320 - 230, 455 - 10)
+COMPLETED_RECT = pygame.Rect(525, 395, 225, 75)
 
 class TextInput:
     """
     Simple text input box.
+    Keeps a prefix-width table and the rendered text surface, both rebuilt only when the text changes.
     """
     def __init__(self, rect, font_size=24):
         self.rect = rect
-        self.font = pygame.font.Font('assets/ByteBounce.ttf', font_size)
-        self.text = ""
+        self.font = assets.font(font_size)
+        self._text = ""
+        self._widths = [0]   # _widths[i] = pixel width of text[:i]
+        self._surf = None    # rendered text, None until the next draw
         self.active = False
         self.cursor_visible = True
-        self.cursor_timer = 0
+        self.cursor_timer = pygame.time.get_ticks() # when the current blink cycle started
         self.cursor_pos = 0
 
         pygame.key.set_repeat(300, 50) # enable key repeat for held keys
 
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value != self._text:
+            self._text = value
+            self._widths = self._prefix_widths(value)
+            self._surf = None
+        self.cursor_pos = min(self.cursor_pos, len(value)) # _text_x() indexes _widths with it
+
+    def _prefix_widths(self, text):
+        """Cumulative glyph advances, so _widths[i] is the width of text[:i]."""
+        widths = [0]
+        total = 0
+        for char, metrics in zip(text, self.font.metrics(text)):
+            total += metrics[4] if metrics else self.font.size(char)[0]
+            widths.append(total)
+        return widths
+
+    def _text_x(self):
+        """Screen x of the start of the text, scrolled so the cursor stays in view."""
+        available_width = self.rect.width - 10  # 5px padding on each side
+        cursor_width = self._widths[self.cursor_pos]
+
+        text_x = self.rect.x + 5 # text offset
+        if self._widths[-1] > available_width and cursor_width > available_width: # scrolling logic
+            text_x -= cursor_width - available_width
+        return text_x
+
     def update(self, events):
         for event in events:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if self.rect.collidepoint(event.pos):
                     self.active = True
-                    mouse_x = event.pos[0] - (self.rect.x + 5) # calculate cursor position for mouse click
+                    mouse_x = event.pos[0] - self._text_x() # calculate cursor position for mouse click
                     self.cursor_pos = self._get_cursor_from_pos(mouse_x)
                 else:
                     self.active = False
@@ -55,8 +90,8 @@ class TextInput:
             if event.type == pygame.KEYDOWN and self.active:
                 if event.key == pygame.K_BACKSPACE:
                     if self.cursor_pos > 0:
-                        self.text = self.text[:self.cursor_pos - 1] + self.text[self.cursor_pos:]
                         self.cursor_pos -= 1
+                        self.text = self.text[:self.cursor_pos] + self.text[self.cursor_pos + 1:]
                 
                 elif event.key == pygame.K_DELETE:
                     if self.cursor_pos < len(self.text):
@@ -79,6 +114,7 @@ class TextInput:
                 
                 elif event.key == pygame.K_v and (event.mod & pygame.KMOD_CTRL or event.mod & pygame.KMOD_META):
                     try:
+                        import pyperclip # only needed on paste; keeps it off the startup path
                         clip = pyperclip.paste()
                         if clip:
                             self.text = self.text[:self.cursor_pos] + clip + self.text[self.cursor_pos:]
@@ -89,37 +125,31 @@ class TextInput:
                     self.text = self.text[:self.cursor_pos] + event.unicode + self.text[self.cursor_pos:]
                     self.cursor_pos += len(event.unicode)
         
-        self.cursor_timer += 1
-        
-        if self.cursor_timer >= 20: # cursor blink rate
-            self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
+        if events and any(event.type == pygame.KEYDOWN for event in events):
+            self.cursor_timer = pygame.time.get_ticks() # keep the cursor solid while typing
+
+        elapsed = pygame.time.get_ticks() - self.cursor_timer
+        self.cursor_visible = (elapsed // CURSOR_BLINK_MS) % 2 == 0
+
+    def wake_in(self):
+        """Milliseconds until the cursor next blinks, or None if it isn't shown."""
+        if not self.active:
+            return None
+        elapsed = pygame.time.get_ticks() - self.cursor_timer
+        return CURSOR_BLINK_MS - elapsed % CURSOR_BLINK_MS
 
     def _get_cursor_from_pos(self, mouse_x):
-        """Calculate cursor position based on mouse x coordinate."""
-        for i in range(len(self.text) + 1):
-            text_width = self.font.render(self.text[:i], True, BLACK).get_width()
-            if mouse_x < text_width:
-                return max(0, i)
-        
-        return len(self.text)
+        """Calculate cursor position based on mouse x coordinate (binary search over prefix widths)."""
+        return min(bisect_right(self._widths, mouse_x), len(self.text))
 
     def draw(self, surface):
         pygame.draw.rect(surface, WHITE, self.rect)
-        txt_surf = self.font.render(self.text, True, BLACK)
+        if self._surf is None:
+            self._surf = self.font.render(self.text, True, BLACK)
+        txt_surf = self._surf
         
-        cursor_text = self.text[:self.cursor_pos] # calcuate cursor position
-        cursor_width = self.font.render(cursor_text, True, BLACK).get_width()
-        
-        text_width = txt_surf.get_width() # calcuate text width
-        available_width = self.rect.width - 10  # 5px padding on each side
-        
-        text_x = self.rect.x + 5 # text offset
-        if text_width > available_width: # scrolling logic
-            if cursor_width > available_width:
-                text_x = self.rect.x + 5 - (cursor_width - available_width)
-            elif cursor_width < 0:
-                text_x = self.rect.x + 5 - cursor_width
+        cursor_width = self._widths[self.cursor_pos] # calcuate cursor position
+        text_x = self._text_x()
         
         clip_rect = pygame.Rect(self.rect.x, self.rect.y, self.rect.width, self.rect.height)
         surface.set_clip(clip_rect) # prevent text from overflowing box
@@ -135,203 +165,223 @@ class TextInput:
         surface.set_clip(None)
 
 
-def osint_level_page(screen, level, click_sound, city, player):
+class OSINTLevelScene(Scene):
     """
     Full-page screen for a single OSINT level.
-    Returns the appropriate GameState to navigate back.
+    Returns GameState.BACK to go back to the city it was opened from.
     """
-    from game import Button, UIElement, RenderUpdates, GameState
-
-    correct_sound = pygame.mixer.Sound("assets/sounds/90s-game-ui-11-185104.wav")
-    wrong_sound = pygame.mixer.Sound("assets/sounds/classic-game-action-negative-5-224417.wav")
-    points_sound = pygame.mixer.Sound("assets/sounds/get-coin-351945.wav")
-
-    dict_city_state = {
-        "portland": GameState.PORTLAND,
-        "eugene": GameState.EUGENE,
-        "corvallis": GameState.CORVALLIS,
-    }
-    state = dict_city_state.get(city, GameState.NEWGAME)
-
-    running = True
-    clock = pygame.time.Clock()
-    
-    is_completed = player.check_levels(level.level_id, city) # check if level already completed
-
-    level_img = pygame.image.load(level.image_path).convert_alpha()
-    level_img = pygame.transform.smoothscale(level_img, (450, 330))
-    level_rect = level_img.get_rect(topleft=(50, 80))
-
-    title_font = pygame.font.Font("assets/ByteBounce.ttf", 45)
-    text_font = pygame.font.Font("assets/ByteBounce.ttf", 20)
-    coin_font = pygame.font.Font("assets/ByteBounce.ttf", 24)
-
-    input_box = TextInput(pygame.Rect(530, 280, 210, 40))
-
-    return_button = UIElement(
-        center_position=(140, 570),
-        font_size=20,
-        bg_rgb=(0,0,0),
-        text_rgb=(255,255,255),
-        text="<--- Return to levels",
-        action=state,
-    )
-    enter_button = Button(675, 340, "assets/buttons/enter_button.png", 1, action="CHECK")
-    download_button = Button(52, 430, "assets/buttons/download_button.png", 1.35, action="DOWNLOAD")
-    buttons = RenderUpdates(return_button, enter_button, download_button)
-
-    download_message = ""
-    result_image = None
-    result_timer = 0
-    show_points = False
-    points_timer = 0
-    points_awarded = 0
-
-    while running:
-        events = pygame.event.get()
-        mouse_up = False
+    def __init__(self, level, click_sound, city, player):
+        super().__init__()
+        from game import Button, UIElement, RenderUpdates, GameState
+
+        self.level = level
+        self.click_sound = click_sound
+        self.city = city
+        self.player = player
+        self.back_action = GameState.BACK
+
+        self.input_box = TextInput(pygame.Rect(530, 280, 210, 40))
+
+        return_button = UIElement(
+            center_position=(140, 570),
+            font_size=20,
+            bg_rgb=(0,0,0),
+            text_rgb=(255,255,255),
+            text="<--- Return to levels",
+            action=self.back_action,
+        )
+        self.enter_button = Button(675, 340, "assets/buttons/enter_button.png", 1, action="CHECK")
+        download_button = Button(52, 430, "assets/buttons/download_button.png", 1.35, action="DOWNLOAD")
+        self.buttons = RenderUpdates(return_button, self.enter_button, download_button)
+        self.input = UIInput(self.buttons, click_sound)
+        self.input.add(self.enter_button, sound=None) # the answer sounds play instead
+
+        self.level_img = None
+        self.download_job = None # ExportJob for the DOWNLOAD button
+        self.result_image = None
+        self.result_timer = 0
+        self.show_points = False
+        self.points_timer = 0
+        self.points_awarded = 0
+
+    def enter(self):
+        super().enter()
+        self.input.reset()
+        self.input_box.text = "" # the scene is reused, so start each visit fresh
+        self.input_box.cursor_pos = 0
+        self.input_box.active = False
+        self.download_job = None
+        self.is_completed = self.player.check_levels(self.level.level_id, self.city) # check if level already completed
+        self.result_image = None
+        self.result_timer = 0
+
+    def exit(self):
+        if self.points_awarded > 0: # left before the points popup finished
+            self.award_points()
+        self.show_points = False
+        self.points_timer = 0
+
+    @property
+    def download_message(self):
+        return self.download_job.message if self.download_job else ""
+
+    def wake_in(self):
+        if self.result_timer > 0 or self.points_timer > 0: # frame-counted timers
+            return 0
+        if self.level_img is None: # poll for the prefetched image
+            return 50
+        if self.download_job and self.download_job.running: # poll export progress
+            return 100
+        return self.input_box.wake_in()
+
+    def award_points(self):
+        self.player.complete_level(self.level.level_id, self.city, self.points_awarded) # one transaction
+        self.points_awarded = 0
+
+    def update(self, events):
+        level, player, city = self.level, self.player, self.city
+        submitted = False # enter key or enter button
         for event in events:
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-                mouse_up = True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN:
-                    user_input = input_box.text.replace(" ", "")
-                    solution = ",".join(level.answer)
-                    
-                    if user_input == solution:
-                        correct_sound.play()
-                        result_image = pygame.image.load("assets/level_icons/check.png").convert_alpha()
-                        result_timer = 80  # Display for 2 seconds at 60 fps
-                        if not is_completed:
-                            points_awarded = point_vals[level.level_id]
-                    else:
-                        wrong_sound.play()
-                        result_image = pygame.image.load("assets/level_icons/x.png").convert_alpha()
-                        result_timer = 80  # Display for 2 seconds at 60 fps
-
-
-        input_box.update(events)
+                    submitted = True
+
+        self.input_box.update(events)
         
         # result image timer
-        if result_timer > 0:
-            result_timer -= 1
-            if result_timer == 0:
-                result_image = None
+        if self.result_timer > 0:
+            self.result_timer -= 1
+            if self.result_timer == 0:
+                self.result_image = None
                 
-                if points_awarded > 0 and not show_points:
-                    points_sound.play()
-                    show_points = True
-                    points_timer = 80
+                if self.points_awarded > 0 and not self.show_points:
+                    audio.play("points")
+                    self.show_points = True
+                    self.points_timer = 80
         
         # points display timer
-        if points_timer > 0:
-            points_timer -= 1
-            if points_timer == 0:
-                show_points = False
-                player.points += points_awarded
-                player.save_game()
-                player.update_levels(level.level_id, city)
-                points_awarded = 0
-
-        mouse_pos = pygame.mouse.get_pos()
-        for button in buttons:
-            button_sound = None if button == enter_button else click_sound
-            action = button.update(mouse_pos, mouse_up, button_sound)
-            
-            if action == state:
-                return state
-            
-            elif action == "DOWNLOAD":
-                try:
-                    downloads_path = os.path.expanduser("~/Downloads")
-                    filename = f"osint_level_{level.level_id}.jpg"
-                    shutil.copy(level.image_path, os.path.join(downloads_path, filename))
-                    download_message = "Image downloaded successfully!"
-                except Exception:
-                    download_message = "Error downloading image!"
-            
-            elif action == "CHECK":
-                user_input = input_box.text.replace(" ", "")
-                solution = ",".join(level.answer)
-                if user_input == solution:
-                    correct_sound.play()
-                    result_image = pygame.image.load("assets/level_icons/check.png").convert_alpha()
-                    result_timer = 120  # Display for 2 seconds at 60 fps
-                    # Only award points if not already completed
-                    if not is_completed:
-                        points_awarded = point_vals[level.level_id]
-                else:
-                    wrong_sound.play()
-                    result_image = pygame.image.load("assets/level_icons/x.png").convert_alpha()
-                    result_timer = 80
-
+        if self.points_timer > 0:
+            self.points_timer -= 1
+            if self.points_timer == 0:
+                self.show_points = False
+                self.award_points()
+
+        action = self.input.update(events)
+        if action == self.back_action:
+            return self.back_action
+        
+        elif action == "DOWNLOAD":
+            if self.download_job is None or not self.download_job.running:
+                self.download_job = exports.export_level(level) # copies on a background thread
+        
+        elif action == "CHECK":
+            submitted = True
+
+        if submitted:
+            distance = distance_to_answer(self.input_box.text, level)
+            correct = distance is not None and distance <= allowed_error_m(self.input_box.text, level)
+            player.record_attempt(level.level_id, city, self.input_box.text, distance, correct)
+            if correct:
+                audio.play("correct")
+                self.result_image = assets.image("assets/level_icons/check.png")
+                self.result_timer = 120  # Display for 2 seconds at 60 fps
+                # Only award points if not already completed
+                if not self.is_completed:
+                    self.points_awarded = level.points
+            else:
+                audio.play("wrong")
+                self.result_image = assets.image("assets/level_icons/x.png")
+                self.result_timer = 80
+
+        if self.level_img is None:
+            self.level_img = level_images.get(level) # None until the worker pool has decoded it
+
+        # work out which regions changed since the last frame
+        from game import BANNER_RECT
+        dirty, input_box = self.dirty, self.input_box
+        dirty.add_sprites(self.input.changed)
+        dirty.watch("input", input_box.rect, (input_box.text, input_box.cursor_pos, input_box.active, input_box.cursor_visible))
+        dirty.watch("result", RESULT_RECT, self.result_image)
+        dirty.watch("banner", BANNER_RECT, (player.points, player.name))
+        dirty.watch("points", POINTS_RECT, (self.show_points, self.points_awarded))
+        dirty.watch("download", DOWNLOAD_MSG_RECT, self.download_message)
+        dirty.watch("completed", COMPLETED_RECT, player.check_levels(level.level_id, city))
+        dirty.watch("level_img", LEVEL_IMAGE_RECT, self.level_img is not None)
+        return None
+
+    def draw(self, screen):
+        level, player = self.level, self.player
         screen.fill((0,0,0))
         from screens import coin_banner
         coin_banner(screen, player)
-        screen.blit(level_img, level_rect)
+        if self.level_img is not None:
+            screen.blit(self.level_img, LEVEL_IMAGE_RECT)
+        else: # placeholder while the image is still decoding
+            pygame.draw.rect(screen, (40, 40, 40), LEVEL_IMAGE_RECT)
+            loading_surf = assets.text("Loading...", 20, (200, 200, 200))
+            screen.blit(loading_surf, loading_surf.get_rect(center=LEVEL_IMAGE_RECT.center))
         pygame.draw.rect(screen, (40, 40, 40), (520, 80, 230, 450))
 
-        title_surf = title_font.render(f"LEVEL {level.level_id}", True, (255,255,255))
+        title_surf = assets.text(f"LEVEL {level.level_id}", 45, (255,255,255))
         screen.blit(title_surf, (570, 95))
         
-        if is_completed == True: # display if level is already completed
-            level_completed_text(screen, level, coin_font, text_font)
+        if self.is_completed == True: # display if level is already completed
+            level_completed_text(screen, level)
         
-        instructions_surf = text_font.render(f"Enter solution in form:", True, (200,200,200))
-        instructions_sol = text_font.render(f"##.###,##.###", True, (200,200,200))
+        instructions_surf = assets.text("Enter solution in form:", 20, (200,200,200))
+        instructions_sol = assets.text("##.###,##.###", 20, (200,200,200))
         screen.blit(instructions_surf, (530, 150))
         screen.blit(instructions_sol, (540, 167))
 
-        example_surf = text_font.render("Example solution:", True, (200,200,200))
-        example_sol = text_font.render("44.0175976,-123.9408846", True, (200,200,200))
+        example_surf = assets.text("Example solution:", 20, (200,200,200))
+        example_sol = assets.text("44.0175976,-123.9408846", 20, (200,200,200))
         screen.blit(example_surf, (530, 210))
         screen.blit(example_sol, (540, 227))
 
-        input_box.draw(screen) # text input box
+        self.input_box.draw(screen) # text input box
 
-        for button in buttons:
+        for button in self.buttons:
             button.draw(screen)
 
-        if download_message:
-            msg_surf = text_font.render(download_message, True, (255, 255, 255))
+        if self.download_message:
+            msg_surf = assets.text(self.download_message, 20, (255, 255, 255))
             msg_rect = msg_surf.get_rect(center=(320, 455))
             screen.blit(msg_surf, msg_rect)
         
-        if result_image:
-            img_rect = result_image.get_rect(center=(640, 450))
-            screen.blit(result_image, img_rect)
+        if self.result_image:
+            img_rect = self.result_image.get_rect(center=(640, 450))
+            screen.blit(self.result_image, img_rect)
         
-        if show_points:
-            points_surf = coin_font.render(f"+{points_awarded}", True, (255, 202, 40))
-            points_rect = points_surf.get_rect(center=(705, 45))
-            screen.blit(points_surf, points_rect)
+        if self.show_points:
+            points_glyphs = assets.glyphs(24, (255, 202, 40))
+            points_text = f"+{self.points_awarded}"
+            points_rect = pygame.Rect((0, 0), points_glyphs.size(points_text))
+            points_rect.center = (705, 45)
+            points_glyphs.draw(screen, points_text, points_rect.topleft)
         
-        if player.check_levels(level.level_id, city): # recompute if level just completed
-            level_completed_text(screen, level, coin_font, text_font)
+        if player.check_levels(level.level_id, self.city): # recompute if level just completed
+            level_completed_text(screen, level)
+
 
-        pygame.display.flip()
-        clock.tick(60)
+def osint_level_page(screen, level, click_sound, city, player):
+    """
+    Runs the page for a single OSINT level in its own blocking loop.
+    Returns GameState.BACK when the player goes back to the city.
+    """
+    from game import GameState
+    return run_scene(screen, OSINTLevelScene(level, click_sound, city, player), quit_action=GameState.QUIT)
 
 
 def load_city_levels(city_name: str):
-    """Reads osint_levels/<city_name>/ and returns a list of OSINTLevel objects."""
-    if city_name not in ["portland", "eugene", "corvallis"]:
-        raise ValueError("Invalid city name")
-
-    levels = []
-    for i in range(1, 6):
-        levels.append(OSINTLevel(city_name, i))
-    return levels
+    """Returns the city's OSINTLevel objects from the level manifest."""
+    return registry.levels(city_name)
 
 
-def level_completed_text(screen, level, coin_font, text_font):
+def level_completed_text(screen, level):
     """Display level completed message with points awarded."""
-    completed_surf = coin_font.render("LEVEL COMPLETED!", True, (102, 187, 106))
-    correct_surf = text_font.render(f"Correct solution:", True, (102, 187, 106))
-    correct_sol = text_font.render(f"{",".join(level.answer)}", True, (102, 187, 106))
+    completed_surf = assets.text("LEVEL COMPLETED!", 24, (102, 187, 106))
+    correct_surf = assets.text("Correct solution:", 20, (102, 187, 106))
+    correct_sol = assets.text(",".join(level.answer), 20, (102, 187, 106))
     screen.blit(completed_surf, (530, 400))
     screen.blit(correct_surf, (530, 430))
     screen.blit(correct_sol, (540, 450))
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from resources import open_resource
+
+DOWNLOADS_DIR = os.path.expanduser("~/Downloads")
+CHUNK_SIZE = 256 * 1024
+
+
+class ExportJob:
+    """ Progress of one export, updated by the worker thread and read by the UI. """
+
+    def __init__(self, destination, done_message):
+        self.destination = destination
+        self.done_message = done_message
+        self.total = 0          # bytes to copy, known once the worker starts
+        self.copied = 0
+        self.done = False
+        self.error = None
+        self._lock = threading.Lock()
+
+    def advance(self, n):
+        with self._lock:
+            self.copied += n
+
+    @property
+    def progress(self):
+        return self.copied / self.total if self.total else 0.0  # still queued behind another export
+
+    @property
+    def running(self):
+        return not self.done and self.error is None
+
+    @property
+    def message(self):
+        if self.error is not None:
+            return "Error downloading image!"
+        if self.done:
+            return self.done_message
+        if not self.total:
+            return "Queued..."
+        return f"Downloading... {int(self.progress * 100)}%"
+
+
+def _resource_size(path):
+    with open_resource(path) as f:
+        return f.seek(0, os.SEEK_END)
+
+
+def _copy(src, dst, job):
+    while chunk := src.read(CHUNK_SIZE):
+        dst.write(chunk)
+        job.advance(len(chunk))
+
+
+class ExportWorker:
+    """
+    Copies level images to the Downloads folder on a background thread, either one
+    image at a time or many levels streamed into a single zip. Files are written
+    to a temp name and renamed when complete.
+    """
+
+    def __init__(self, downloads_dir=DOWNLOADS_DIR):
+        self.downloads_dir = downloads_dir
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+
+    def _run(self, job, write):
+        directory = os.path.dirname(job.destination)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        except OSError as e:
+            job.error = e
+            return
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                write(dst)
+            os.replace(tmp_path, job.destination)
+            job.done = True
+        except Exception as e:
+            job.error = e
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def export_level(self, level):
+        """ Starts copying one level's image; returns its ExportJob. """
+        filename = f"osint_level_{level.level_id}.jpg"
+        job = ExportJob(os.path.join(self.downloads_dir, filename), "Image downloaded successfully!")
+
+        def write(dst):
+            job.total = _resource_size(level.image_path)
+            with open_resource(level.image_path) as src:
+                _copy(src, dst, job)
+
+        self._pool.submit(self._run, job, write)
+        return job
+
+    def export_levels(self, levels, name):
+        """ Starts streaming every level's image into Downloads/<name>.zip; returns its ExportJob. """
+        job = ExportJob(os.path.join(self.downloads_dir, f"{name}.zip"), f"Saved {name}.zip to Downloads!")
+
+        import zipfile # only bulk exports need it
+
+        def write(dst):
+            job.total = sum(_resource_size(level.image_path) for level in levels)
+            # JPEGs don't compress further, so store them and keep the copy streaming
+            with zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_STORED) as zf:
+                for level in levels:
+                    arcname = f"{level.city}/osint_level_{level.level_id}.jpg"
+                    with open_resource(level.image_path) as src, zf.open(arcname, "w", force_zip64=True) as entry:
+                        _copy(src, entry, job)
+
+        self._pool.submit(self._run, job, write)
+        return job
+
+    def shutdown(self):
+        """ Waits for the export in progress to finish and drops any queued ones. """
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+exports = ExportWorker()
@@ -1,14 +1,25 @@
 import pygame
 from pygame.sprite import Sprite, RenderUpdates
-import json, os
+import os, threading
 from enum import Enum
 
-from challenges import load_city_levels, osint_level_page
+from challenges import load_city_levels, OSINTLevelScene, level_images, registry
+from asset_cache import assets
+from scenes import Scene, SceneStack, DirtyRects, FrameScheduler, run_scene, soonest
+from profiler import profiler
+from export import exports
+from audio import audio
+from level_grid import LevelGrid
+from ui_input import UIInput
+from progress import ProgressDB, DB_PATH
 
 # global variables
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 WIDTH, HEIGHT = 800, 600
+SAVE_PATH = "save_data.json"  # pre-database saves, imported on first run
+BANNER_RECT = pygame.Rect(0, 0, WIDTH, 47)  # coin banner at the top of player screens
+EXPORT_MSG_RECT = pygame.Rect(WIDTH - 400, HEIGHT - 70, 390, 20)  # bulk export progress, above its button
 
 # animation variables
 center_x = WIDTH // 2
@@ -69,8 +80,7 @@ class UIElement(Sprite):
         if self.rect.collidepoint(mouse_pos):
             self.mouse_over = True
             if mouse_up:
-                if sound:
-                    sound.play()
+                audio.play(sound)
                 return self.action
         else:
             self.mouse_over = False
@@ -87,61 +97,78 @@ class GameState(Enum):
     NEWGAME = 1
     # CHARACTER = 2
     OSINT = 4
-    
-    PORTLAND = 10
-    CORVALLIS = 11
-    EUGENE = 12
 
     DOWNLOAD = 20
     CHECK = 21
+    BACK = 22  # leave the current page for the one that opened it
 
 
 class Player:
-    """ Stores information about a player: points and name (under save_data.json)."""
-
-    def __init__(self, save_file):
-        self.points = save_file["points"]
-        self.name = save_file["name"]
-
-    def save_game(player): # FIXME
-        try:
-            with open("save_data.json", "r") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            exit(-1)
-
-        data["save_file"]["points"] = player.points
-        data["save_file"]["name"] = player.name
-
-        with open("save_data.json", "w") as f: # write back to file
-            json.dump(data, f, indent=4)
+    """ A player profile in the progress database (progress.py): points, name and completed levels.
+    Reads come from memory. Changes are queued on the database's writer thread, so the frame
+    loop never waits on disk; `flush()` waits for them to be written (e.g. on quit).
+    """
 
-    def update_levels(player, level:int, city:str):
-        """ Marks a level as completed under player save file. """
+    def __init__(self, db, profile_id):
+        row = db.profile(profile_id)
+        self.db = db
+        self.profile_id = profile_id
+        self.points = row["points"]
+        self.name = row["name"]
+        self.levels = db.completed_levels(profile_id)  # city -> {level_id, ...}
+
+        self._lock = threading.Lock()
+        self._save_queued = False
+        self._unsaved_awards = 0  # points of awards queued but not yet committed
+
+    def save_game(player):
+        """ Queues a write of the player's name and points; repeated calls before it runs share one write. """
+        with player._lock:
+            if player._save_queued:
+                return
+            player._save_queued = True
+        player.db.submit(player._write_profile)
+
+    def _write_profile(player):
+        with player._lock:
+            player._save_queued = False
+            # queued awards add their own points when they commit
+            name, points = player.name, player.points - player._unsaved_awards
+        player.db.update_profile(player.profile_id, name, points)
+
+    def complete_level(player, level:int, city:str, points:int=0) -> bool:
+        """ Marks a level completed and awards its points, once; returns False if it already was. """
+        with player._lock:
+            completed = player.levels.setdefault(city, set())
+            if level in completed:
+                return False
+            completed.add(level)
+            player.points += points
+            player._unsaved_awards += points
+        player.db.submit(player._write_award, level, city, points)
+        return True
+
+    def _write_award(player, level, city, points):
         try:
-            with open("save_data.json", "r") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            exit(-1)
+            player.db.award(player.profile_id, city, level, points)
+        finally:
+            with player._lock:
+                player._unsaved_awards -= points
 
-        level_key = str(level)  # ensure level is string for JSON keys
-
-        data["save_file"]["levels"][city][level_key] = "completed"
-
-        with open("save_data.json", "w") as f: # write back to file
-            json.dump(data, f, indent=4)
+    def record_attempt(player, level:int, city:str, submission:str, distance_m, correct:bool):
+        """ Queues an answer attempt for the level's statistics. """
+        player.db.submit(player.db.record_attempt, player.profile_id, city, level, submission, distance_m, correct)
 
     def check_levels(player, level:int, city:str) -> bool:
-        """ Checks if a level has been completed under player save file. """
-        try:
-            with open("save_data.json", "r") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            exit() # crash the game if save file can't be created
+        """ Checks if the player has completed a level. """
+        return level in player.levels.get(city, ())
 
-        level_key = str(level)  # ensure level is string for JSON keys
+    def flush(player):
+        """ Waits until every queued change has been written. """
+        player.db.wait()
 
-        return data["save_file"]["levels"][city].get(level_key) == "completed"
+    def close(player):
+        player.db.close()
 
 
 # class Character: # TODO
@@ -156,17 +183,17 @@ class Button(Sprite):
     """
     def __init__(self, x, y, image_path, scale=None, size=None, action=None, unlocked=True):
         super().__init__()
-        image = pygame.image.load(image_path).convert_alpha()
         
         if size is not None:
-            scaled_image = pygame.transform.scale(image, (int(size[0]), int(size[1])))
+            scaled_image = assets.image(image_path, size=(int(size[0]), int(size[1])))
             hover_size = (int(size[0] * 1.1), int(size[1] * 1.1))
-            scaled_image_hover = pygame.transform.scale(image, hover_size)
+            scaled_image_hover = assets.image(image_path, size=hover_size)
         elif scale is not None:
+            image = assets.image(image_path)
             width = image.get_width()
             height = image.get_height()
-            scaled_image = pygame.transform.scale(image, (int(width * scale), int(height * scale)))
-            scaled_image_hover = pygame.transform.scale(image, (int(width * scale * 1.1), int(height * scale * 1.1)))
+            scaled_image = assets.image(image_path, size=(int(width * scale), int(height * scale)))
+            scaled_image_hover = assets.image(image_path, size=(int(width * scale * 1.1), int(height * scale * 1.1)))
         
         # Store images and rects as lists for hover effect
         self.images = [scaled_image, scaled_image_hover]
@@ -175,7 +202,6 @@ class Button(Sprite):
         self.rects = [rect_default, rect_hover]
 
         self.action = action
-        self.clicked = False
         self.mouse_over = False
         self.unlocked = unlocked
 
@@ -199,44 +225,72 @@ class Button(Sprite):
         if self.rect.collidepoint(mouse_pos):
             self.mouse_over = True
             if mouse_up:
-                if sound:
-                    sound.play()
+                audio.play(sound)
                 return self.action
         else:
             self.mouse_over = False
 
     def draw(self, surface):
-        action = False
-        pos = pygame.mouse.get_pos() # get mouse position
+        """ Draws the button; hover and clicks are handled by update(). """
+        surface.blit(self.image, (self.rect.x, self.rect.y)) # draw button on screen
 
-        if self.rect.collidepoint(pos):        #check mouseover and clicked conditions
-            if pygame.mouse.get_pressed()[0] == 1 and self.clicked == False:
-                self.clicked = True
-                action = True
 
-        if pygame.mouse.get_pressed()[0] == 0:
-            self.clicked = False
+CITY_BACKGROUNDS = {
+    "portland": 'assets/background_images/portland_pixel.png',
+    "corvallis": 'assets/background_images/corvallis_pixel.png',
+    "eugene": 'assets/background_images/eugene_pixel.png',
+}
+PLAIN_BACKGROUND = (24, 40, 64)  # for cities added to the manifest without background art
 
-        surface.blit(self.image, (self.rect.x, self.rect.y)) # draw button on screen
-        return action
 
+def city_background(city:str):
+    """ Returns a city's background scaled to the window (cached after the first call), or a plain one if it has no art. """
+    if city not in CITY_BACKGROUNDS:
+        background = pygame.Surface((WIDTH, HEIGHT))
+        background.fill(PLAIN_BACKGROUND)
+        return background
+    return assets.image(CITY_BACKGROUNDS[city], size=(WIDTH, HEIGHT), alpha=False, cache_source=False)
 
-def play_circle_animation(screen, state:GameState):
-    """Plays the expanding circle animation."""
-    clock = pygame.time.Clock()
-    global current_radius
-    current_radius = 0
-    if state == GameState.PORTLAND:
-        background = pygame.image.load(os.path.join('assets/background_images/portland_pixel.png')).convert()
-    elif state == GameState.CORVALLIS:
-        background = pygame.image.load(os.path.join('assets/background_images/corvallis_pixel.png')).convert()
-    elif state == GameState.EUGENE:
-        background = pygame.image.load(os.path.join('assets/background_images/eugene_pixel.png')).convert()
-    background = pygame.transform.scale(background, (WIDTH, HEIGHT))     # Scale the image to fit the window size
-
-    
-    while current_radius < max_radius:
-        screen.fill(BLACK)
+
+def warm_city_backgrounds():
+    """ Decodes and scales every city background ahead of time, so transitions never touch the disk. """
+    for city in CITY_BACKGROUNDS:
+        city_background(city)
+
+
+class CircleTransition:
+    """
+    Expanding circle reveal of a city background, run as an effect inside the frame loop.
+    Progress depends on elapsed time, not frame rate. Escape cancels it (back to
+    `origin`), any other key or click skips to the end.
+    """
+    DURATION = 560  # ms, about the old 45 frames at 80 fps
+
+    def __init__(self, city:str, duration=DURATION, origin=None):
+        self.city = city
+        self.origin = origin  # the scene that started it, shown again if it is cancelled
+        self.background = city_background(city)
+        self.duration = duration
+        self.elapsed = 0
+        self.cancelled = False
+        self._started = False
+
+    @property
+    def finished(self):
+        return self.elapsed >= self.duration
+
+    def update(self, events, dt):
+        """ Advances the transition by `dt` milliseconds. """
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.cancelled = True
+            elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONUP):
+                self.elapsed = self.duration
+        self.elapsed += dt
+
+    def draw(self, screen):
+        """ Draws the current frame and pushes only the region that changed. """
+        current_radius = int(max_radius * min(1.0, self.elapsed / self.duration))
 
         # clip screen to circle
         clip_rect = pygame.Rect(
@@ -244,136 +298,156 @@ def play_circle_animation(screen, state:GameState):
             center_y - current_radius,
             current_radius * 2,
             current_radius * 2
-        )
+        ).clip(screen.get_rect())
 
+        if not self._started:
+            screen.fill(BLACK)
         screen.set_clip(clip_rect)
-        screen.blit(background, (0, 0))
+        screen.blit(self.background, (0, 0))
         screen.set_clip(None)
-        pygame.display.flip()
 
-        current_radius += 10   # speed control (bigger = faster)
-        clock.tick(80)
+        if not self._started:
+            self._started = True
+            pygame.display.flip()
+        else:
+            pygame.display.update(clip_rect)
+
+
+def play_circle_animation(screen, city:str):
+    """Plays the expanding circle animation (blocking; the main loop runs CircleTransition itself)."""
+    clock = pygame.time.Clock()
+    transition = CircleTransition(city)
+    dt = 0
+    while not (transition.finished or transition.cancelled):
+        transition.update(pygame.event.get(), dt)
+        transition.draw(screen)
+        dt = clock.tick(80)
 
 
 def create_surface_with_text(text, font_size, text_rgb, bg_rgb=None):
     """ Returns surface with text written on """
-    font = pygame.font.Font('assets/ByteBounce.ttf', int(font_size))
-    surface = font.render(text, True, text_rgb, bg_rgb)  # antialias=True
-    return surface.convert_alpha()
+    return assets.text(text, font_size, text_rgb, antialias=True, bg=bg_rgb)
 
 
 def load_game():
-    ''' For loading game information from save_data.json. '''
-    try:
-        with open("save_data.json", "r") as f:
-            data = json.load(f)
-        return Player(**data)
-    except FileNotFoundError:
-        return Player()  # fresh save
-
-
-def game_loop(screen, buttons, sound=None, background=None, city=None, level_boxes=None, levels=None, draw_extra=None, player=None):
-    active_osint = None
-    clock = pygame.time.Clock()
-    
-    check_overlays = {} # pre load check mark images for completed levels
-    if level_boxes and city and player:
-        check_img = pygame.image.load('assets/level_icons/check.png').convert_alpha()
-        for box in level_boxes:
-            level_id = box.action
-            if level_id and player.check_levels(level_id, city):
-                check_scaled = pygame.transform.scale(
-                    check_img,
-                    (box.rect.width - 65, box.rect.height - 65)
-                )
-                check_overlays[level_id] = check_scaled
-
-    while True:
-        mouse_up = False
-        events = pygame.event.get()
-
-        for event in events:
-            if event.type == pygame.QUIT:
-                return GameState.QUIT
-            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-                mouse_up = True
-
-        mouse_pos = pygame.mouse.get_pos()
-
-        if active_osint:
-            result = active_osint.update(events)
+    ''' Opens the progress database and returns the active profile's Player.
+    On first run an existing save_data.json becomes the first profile. '''
+    with profiler.phase("io"):
+        db = ProgressDB(DB_PATH)
+        if not db.profiles() and os.path.exists(SAVE_PATH):
+            db.import_json(SAVE_PATH)
+        profile_id = db.active_profile
+        if profile_id is None:
+            profile_id = db.create_profile()
+        return Player(db, profile_id)
+
+
+class MenuScene(Scene):
+    """
+    A menu screen: buttons over a background, plus an optional LevelGrid of a city's
+    levels. Clicking a level tile opens that level's page (built once, then reused).
+    """
 
-            if background:
-                screen.blit(background, (0, 0))
-            else:
-                screen.fill(BLACK)
+    def __init__(self, buttons, sound=None, background=None, city=None, grid=None, draw_extra=None, player=None,
+                 export_name=None, export_levels=None):
+        super().__init__()
+        self.buttons = buttons
+        self.sound = sound
+        self.background = background
+        self.city = city
+        self.grid = grid
+        self.draw_extra = draw_extra
+        self.player = player
+        self.level_scenes = {}  # level_id -> OSINTLevelScene
+        self.export_name = export_name  # zip name for the GameState.DOWNLOAD button
+        self.export_levels = export_levels  # callable returning the levels to put in it
+        self.export_job = None
+        self.input = UIInput(buttons, sound)
+
+    def enter(self):
+        super().enter()
+        self.input.reset()
+        if self.grid:
+            level_images.prefetch(self.grid.visible_levels())
+        self.refresh_completed()
+
+    def refresh_completed(self):
+        """ Re-reads which of the city's levels are completed; the grid recomposes only the tiles that changed. """
+        if self.grid and self.city and self.player:
+            self.grid.set_completed(level.level_id for level in self.grid.levels
+                                    if self.player.check_levels(level.level_id, self.city))
+
+    def level_scene(self, level_id):
+        scene = self.level_scenes.get(level_id)
+        if scene is None:
+            level = registry.level(self.city, level_id)
+            scene = OSINTLevelScene(level, self.sound, self.city, self.player)
+            self.level_scenes[level_id] = scene
+        return scene
 
-            active_osint.draw(screen)
-            pygame.display.flip()
-            clock.tick(60)
+    @property
+    def export_message(self):
+        return self.export_job.message if self.export_job else ""
 
-            if result is True:
-                print("Correct!")
-                active_osint = None
+    def start_export(self):
+        """ Zips this screen's level images into Downloads on the export thread. """
+        if self.export_levels and (self.export_job is None or not self.export_job.running):
+            self.export_job = exports.export_levels(self.export_levels(), self.export_name)
 
-            elif result is False:
-                print("Incorrect!")
+    def wake_in(self):
+        if self.export_job and self.export_job.running: # poll export progress
+            return 100
+        return None
 
-            continue
+    def update(self, events):
+        mouse_up = any(event.type == pygame.MOUSEBUTTONUP and event.button == 1 for event in events)
+        mouse_pos = pygame.mouse.get_pos()
 
-        if background:
-            screen.blit(background, (0, 0))
+        if self.grid:
+            scroll = self.grid.scroll
+            clicked_level_id = self.grid.update(events, mouse_pos, mouse_up)
+            if clicked_level_id is not None:
+                return self.level_scene(clicked_level_id)
+            if self.grid.scroll != scroll: # decode the levels scrolled into view
+                level_images.prefetch(self.grid.visible_levels())
+
+        action = self.input.update(events, mouse_pos)
+        if action == GameState.DOWNLOAD:
+            self.start_export()
+        elif action is not None:
+            return action
+
+        # work out which regions changed since the last frame
+        self.dirty.add_sprites(self.input.changed)
+        self.dirty.watch("export", EXPORT_MSG_RECT, self.export_message)
+        if self.grid:
+            self.dirty.watch("grid", self.grid.rect, (self.grid.scroll, self.grid.hovered))
+        if self.player:
+            self.dirty.watch("banner", BANNER_RECT, (self.player.points, self.player.name))
+        return None
+
+    def draw(self, screen):
+        if self.background:
+            screen.blit(self.background, (0, 0))
         else:
             screen.fill(BLACK)
 
-        if draw_extra:
-            draw_extra(screen)
-
-        if level_boxes and levels:
-            for box in level_boxes:
-                clicked_level_id = box.update(mouse_pos, mouse_up, sound)
-                box.draw(screen)
-                
-                level_id = box.action
-                if level_id in check_overlays:
-                    overlay = pygame.Surface(box.rect.size, pygame.SRCALPHA)
-                    overlay.fill((0, 0, 0, 80))
-                    screen.blit(overlay, box.rect.topleft)
-
-                    check_img = check_overlays[level_id]
-                    check_rect = check_img.get_rect(center=box.rect.center)
-                    screen.blit(check_img, check_rect)
-
-                if clicked_level_id:
-                    level = levels[clicked_level_id - 1]
-                    result = osint_level_page(screen, level, sound, city, player)
-                    
-                    # Refresh check_overlays after completing a level
-                    if result != GameState.TITLE:
-                        check_overlays.clear()
-                        for box2 in level_boxes:
-                            level_id2 = box2.action
-                            if level_id2 and player.check_levels(level_id2, city):
-                                check_scaled = pygame.transform.scale(
-                                    check_img,
-                                    (box2.rect.width - 65, box2.rect.height - 65)
-                                )
-                                check_overlays[level_id2] = check_scaled
-                    
-                    if result == "TITLE":
-                        return GameState.TITLE
-
-        for button in buttons:
-            action = button.update(mouse_pos, mouse_up, sound)
-            if action is not None:
-                if action in (GameState.PORTLAND, GameState.CORVALLIS, GameState.EUGENE):
-                    play_circle_animation(screen, action)
-                return action
-
-        buttons.draw(screen)
-        
-        pygame.display.flip()
-        clock.tick(60)
+        if self.draw_extra:
+            self.draw_extra(screen)
+
+        if self.grid:
+            self.grid.draw(screen)
+
+        self.buttons.draw(screen)
 
+        if self.export_message:
+            msg_surf = assets.text(self.export_message, 20, WHITE)
+            screen.blit(msg_surf, msg_surf.get_rect(midright=EXPORT_MSG_RECT.midright))
 
 
+def run_menu(screen, scene):
+    """ Runs a MenuScene in its own blocking loop and returns the chosen GameState (or city name). """
+    action = run_scene(screen, scene, quit_action=GameState.QUIT)
+    if action in registry.cities():
+        play_circle_animation(screen, action)
+    return action
@@ -0,0 +1,107 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for grade_batch
+    np = None
+
+EARTH_RADIUS_M = 6371008.8  # mean Earth radius
+DEFAULT_TOLERANCE_M = 25.0  # how far off (in metres) an answer can be and still count
+PROMPT_DECIMALS = 3  # the answer format the level page asks for ("##.###,##.###")
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def parse_coordinates(text):
+    """ Parses "lat,lon" (spaces ignored) into a (lat, lon) float tuple, or None if it isn't valid. """
+    parts = text.replace(" ", "").split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):  # also rejects nan
+        return None
+    return lat, lon
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """ Great-circle distance in metres between two (lat, lon) points in degrees. """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def level_target(level):
+    """ Returns the level's answer as a (lat, lon) float tuple. """
+    return float(level.answer[0]), float(level.answer[1])
+
+
+def distance_to_answer(submission, level):
+    """ Distance in metres from a submission to the level's answer, or None if it can't be parsed. """
+    coords = parse_coordinates(submission)
+    if coords is None:
+        return None
+    return haversine_m(*coords, *level_target(level))
+
+
+def rounding_error_m(submission, lat):
+    """
+    Worst-case distance (metres, at latitude `lat`) added by rounding to the number of
+    decimals typed. Anything coarser than the prompted format only gets that format's slack.
+    """
+    parts = submission.replace(" ", "").split(",")
+    if len(parts) != 2:
+        return 0.0
+    half_steps = []
+    for part in parts:
+        decimals = len(part.split(".", 1)[1]) if "." in part else 0
+        half_steps.append(0.5 * 10 ** -max(decimals, PROMPT_DECIMALS) * METRES_PER_DEGREE)
+    return math.hypot(half_steps[0], half_steps[1] * math.cos(math.radians(lat)))
+
+
+def allowed_error_m(submission, level):
+    """ How far off a submission may be: the level's tolerance radius plus the rounding of the precision typed. """
+    tolerance = getattr(level, "tolerance_m", DEFAULT_TOLERANCE_M)
+    return tolerance + rounding_error_m(submission, level_target(level)[0])
+
+
+def grade(submission, level):
+    """ True if the submission is within the level's tolerance radius of its answer (see allowed_error_m). """
+    distance = distance_to_answer(submission, level)
+    if distance is None:
+        return False
+    return distance <= allowed_error_m(submission, level)
+
+
+def grade_batch(submissions, levels):
+    """
+    Grades many (submission, level) pairs at once, e.g. when replaying logs.
+    Returns (correct, distances): a bool array and a float array in metres
+    (nan where the submission couldn't be parsed). Uses numpy when available.
+    """
+    if len(submissions) != len(levels):
+        raise ValueError("submissions and levels must be the same length")
+
+    # parsing is per-string work; everything after it is vectorized
+    parsed = [parse_coordinates(s) for s in submissions]
+    nan = float("nan")
+    sub = [p if p is not None else (nan, nan) for p in parsed]
+    targets = [level_target(level) for level in levels]
+    tolerances = [allowed_error_m(s, level) for s, level in zip(submissions, levels)]
+
+    if np is None:
+        distances = [haversine_m(*s, *t) if s[0] == s[0] else nan for s, t in zip(sub, targets)]
+        return [d <= tol for d, tol in zip(distances, tolerances)], distances
+
+    sub = np.radians(np.asarray(sub, dtype=np.float64).reshape(-1, 2))
+    targets = np.radians(np.asarray(targets, dtype=np.float64).reshape(-1, 2))
+    d_phi = targets[:, 0] - sub[:, 0]
+    d_lambda = targets[:, 1] - sub[:, 1]
+    a = np.sin(d_phi / 2) ** 2 + np.cos(sub[:, 0]) * np.cos(targets[:, 0]) * np.sin(d_lambda / 2) ** 2
+    distances = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+    with np.errstate(invalid="ignore"):  # nan <= tol is simply False
+        correct = distances <= np.asarray(tolerances, dtype=np.float64)
+    return correct, distances
@@ -0,0 +1,131 @@
+"""
+On-disk cache of pre-scaled, display-ready level images.
+
+Entries are keyed by source path, source mtime and target size, so editing or
+replacing a level image simply misses the cache; storing the new entry deletes the old one. Warm it ahead of time with:
+
+    python image_cache.py warm [city ...]
+    python image_cache.py clear
+"""
+import pygame
+import glob, hashlib, os, sys, tempfile
+
+from asset_cache import load_image
+from resources import resource_mtime
+
+CACHE_DIR = os.path.join(".cache", "images")
+LEVELS_DIR = "osint_levels"
+
+DISPLAY_SIZE = (450, 330)  # size shown on the level page
+
+
+def _entry_path(path, size):
+    """ Returns the cache file for `path` at `size`, or None if the source doesn't exist. """
+    mtime = resource_mtime(path)
+    if mtime is None:
+        return None
+    version = hashlib.sha1(f"{path}|{mtime}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{_entry_prefix(path, size)}{version}.rgb")
+
+
+def _entry_prefix(path, size):
+    """ The part of an entry's file name shared by every version of `path` at `size`. """
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    return f"{digest}_{size[0]}x{size[1]}_"
+
+
+def load(path, size):
+    """ Returns the cached image for `path` at `size` if the entry is fresh, otherwise None. """
+    entry = _entry_path(path, size)
+    if entry is None:
+        return None
+    try:
+        with open(entry, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) != size[0] * size[1] * 3:  # truncated or foreign file
+        return None
+    return pygame.image.frombytes(data, size, "RGB")
+
+
+def store(path, size, image):
+    """ Writes `image` (already scaled to `size`) to the cache (temp file + rename). """
+    entry = _entry_path(path, size)
+    if entry is None:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pygame.image.tobytes(image, "RGB"))
+        os.replace(tmp_path, entry)
+        _remove_stale(path, size, entry)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _remove_stale(path, size, current):
+    """ Deletes entries for older versions of `path` at `size`, so edited images don't pile up. """
+    for stale in glob.glob(os.path.join(CACHE_DIR, glob.escape(_entry_prefix(path, size)) + "*.rgb")):
+        if stale != current:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def scale(image, size):
+    """ Smooth-scales a freshly decoded image to `size`. """
+    if image.get_bitsize() not in (24, 32):
+        image = image.convert(32, 0)
+    return pygame.transform.smoothscale(image, size)
+
+
+def load_scaled(path, size):
+    """ Returns `path` scaled to `size`, from the cache when fresh, decoding and caching it otherwise.
+    Safe to call from worker threads (the result is not converted to the display format).
+    """
+    image = load(path, size)
+    if image is None:
+        image = scale(load_image(path), size)
+        store(path, size, image)
+    return image
+
+
+def warm(cities=None, sizes=(DISPLAY_SIZE,)):
+    """ Builds cache entries for every level image (optionally only for `cities`). """
+    built = 0
+    for path in sorted(glob.glob(os.path.join(LEVELS_DIR, "*", "*", "*.jpg"))):
+        city = path.split(os.sep)[-3]
+        if cities and city not in cities:
+            continue
+        missing = [size for size in sizes if load(path, size) is None]
+        if not missing:
+            continue
+        source = load_image(path)
+        for size in missing:
+            store(path, size, scale(source, size))
+        built += len(missing)
+        print(f"cached {path} ({len(missing)} sizes)")
+    return built
+
+
+def clear():
+    """ Removes every cache entry. """
+    for entry in glob.glob(os.path.join(CACHE_DIR, "*")):
+        os.remove(entry)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "warm"
+    if command == "warm":
+        print(f"{warm(sys.argv[2:])} cache entries built")
+    elif command == "clear":
+        clear()
+    else:
+        print(__doc__)
+        sys.exit(2)
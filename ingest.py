@@ -0,0 +1,280 @@
+"""
+Turns a directory of raw photos into levels for one city.
+
+Each photo (.jpg, .jpeg or .png) needs a sidecar .txt with the same name holding
+"lat,lon"; an optional second line sets the tolerance radius in metres, as in the
+solution files. The photos are processed in parallel, one per worker process, and
+each is decoded once to produce:
+
+    osint_levels/<city>/<id>/<id>.jpg   re-encoded, long edge at most MAX_IMAGE_EDGE
+    osint_levels/<city>/<id>/<id>.txt   the solution
+    osint_levels/<city>/<id>/icon.png   the level grid tile
+    .cache/images/                      the level page size (see image_cache.py)
+
+Re-encoding through pygame drops all metadata, including GPS tags that would give
+the answer away; the EXIF orientation is applied first so portrait shots stay
+upright. New levels get ids after the city's last one and are added to levels.json
+once every photo is done. Rebuild assets.pak afterwards if the game runs from a bundle.
+
+    python ingest.py <city> <photo dir> [-p points] [-j workers] [-n]
+
+-p sets the points for every new level (default 1000), -j the number of worker
+processes, and -n only checks the photos and coordinates without writing anything.
+"""
+import pygame
+import io, json, os, struct, sys, tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import image_cache
+from grading import parse_coordinates, haversine_m
+from levels import MANIFEST_PATH
+from level_grid import TILE_SIZE
+
+LEVELS_DIR = "osint_levels"
+PHOTO_TYPES = (".jpg", ".jpeg", ".png")
+MAX_IMAGE_EDGE = 2000  # the long edge of the full-size image players download and zoom into
+DEFAULT_POINTS = 1000
+GPS_MISMATCH_M = 1000  # warn if the photo's own GPS tag is further than this from the answer
+
+# EXIF orientation -> (mirror horizontally, then rotate counterclockwise by degrees)
+ORIENTATIONS = {2: (True, 0), 3: (False, 180), 4: (True, 180), 5: (True, 90), 6: (False, -90), 7: (True, -90), 8: (False, 90)}
+
+
+def read_exif(data):
+    """ Returns (orientation, (lat, lon) or None) from a JPEG's EXIF block; (1, None) if it has none. """
+    if data[:2] != b"\xff\xd8":
+        return 1, None
+    offset = 2
+    try:
+        while offset + 4 <= len(data) and data[offset] == 0xFF:
+            marker = data[offset + 1]
+            if marker in (0xD9, 0xDA):  # end of image / start of scan: no metadata after this
+                break
+            (length,) = struct.unpack_from(">H", data, offset + 2)
+            if marker == 0xE1 and data[offset + 4:offset + 10] == b"Exif\0\0":
+                return _read_tiff(data[offset + 10:offset + 2 + length])
+            offset += 2 + length
+    except (struct.error, IndexError, ZeroDivisionError):  # truncated or malformed EXIF
+        pass
+    return 1, None
+
+
+def _read_tiff(tiff):
+    endian = "<" if tiff[:2] == b"II" else ">"
+
+    def directory(pos):
+        (count,) = struct.unpack_from(endian + "H", tiff, pos)
+        return {tag: (kind, n, value) for tag, kind, n, value in
+                (struct.unpack_from(endian + "HHI4s", tiff, pos + 2 + 12 * i) for i in range(count))}
+
+    def degrees(entry):  # three rationals: degrees, minutes, seconds
+        (pos,) = struct.unpack(endian + "I", entry[2])
+        parts = struct.unpack_from(endian + "6I", tiff, pos)
+        return sum(parts[2 * i] / parts[2 * i + 1] / 60 ** i for i in range(3))
+
+    (first,) = struct.unpack_from(endian + "I", tiff, 4)
+    ifd0 = directory(first)
+    orientation = struct.unpack_from(endian + "H", ifd0[0x0112][2])[0] if 0x0112 in ifd0 else 1
+    position = None
+    if 0x8825 in ifd0:
+        gps = directory(struct.unpack(endian + "I", ifd0[0x8825][2])[0])
+        if all(tag in gps for tag in (1, 2, 3, 4)):
+            lat, lon = degrees(gps[2]), degrees(gps[4])
+            position = (-lat if gps[1][2][:1] == b"S" else lat, -lon if gps[3][2][:1] == b"W" else lon)
+    return orientation, position
+
+
+def orient(image, orientation):
+    """ Turns `image` upright according to its EXIF orientation. """
+    mirror, angle = ORIENTATIONS.get(orientation, (False, 0))
+    if mirror:
+        image = pygame.transform.flip(image, True, False)
+    if angle:
+        image = pygame.transform.rotate(image, angle)
+    return image
+
+
+def fit(size, edge):
+    """ `size` scaled down so its long edge is at most `edge`. """
+    w, h = size
+    scale = min(1.0, edge / max(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def make_icon(image, size=TILE_SIZE):
+    """ A rounded, framed square from the middle of the photo, for the level grid. """
+    w, h = image.get_size()
+    side = min(w, h)
+    square = image.subsurface(pygame.Rect((w - side) // 2, (h - side) // 2, side, side))
+    square = pygame.transform.smoothscale(square, (size, size))
+    icon = pygame.Surface((size, size), pygame.SRCALPHA)
+    rect = icon.get_rect()
+    pygame.draw.rect(icon, (255, 255, 255, 255), rect, border_radius=size // 8)
+    icon.blit(square, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)  # keeps the rounded alpha
+    pygame.draw.rect(icon, (255, 255, 255), rect, width=max(2, size // 40), border_radius=size // 8)
+    return icon
+
+
+def read_sidecar(path):
+    """ Returns ((lat, lon), tolerance_m or None) from a photo's .txt; raises ValueError if it isn't valid. """
+    try:
+        with open(path, "r") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    except OSError:
+        raise ValueError(f"missing {os.path.basename(path)}") from None
+    coords = parse_coordinates(lines[0]) if lines else None
+    if coords is None:
+        raise ValueError(f"{os.path.basename(path)}: expected \"lat,lon\" on the first line")
+    if coords == (0.0, 0.0):
+        raise ValueError(f"{os.path.basename(path)}: 0,0 is not a real answer")
+    tolerance = None
+    if len(lines) > 1:
+        try:
+            tolerance = float(lines[1])
+        except ValueError:
+            tolerance = -1
+        if not tolerance > 0:
+            raise ValueError(f"{os.path.basename(path)}: tolerance must be a positive number of metres")
+    return coords, tolerance
+
+
+def process_photo(job):
+    """
+    Runs in a worker process: decodes one photo and writes everything its level needs.
+    Returns (manifest entry, notes about the photo).
+    """
+    source, city, level_id, points, coords, tolerance = job
+    level_dir = f"{LEVELS_DIR}/{city}/{level_id}"
+    image_path = f"{level_dir}/{level_id}.jpg"
+    solution_path = f"{level_dir}/{level_id}.txt"
+    icon_path = f"{level_dir}/icon.png"
+    notes = []
+
+    with open(source, "rb") as f:
+        data = f.read()
+    orientation, gps = read_exif(data)
+    image = pygame.image.load(io.BytesIO(data), source)
+    if image.get_bitsize() not in (24, 32):
+        image = image.convert(32, 0)
+    if orientation in ORIENTATIONS:
+        image = orient(image, orientation)
+        notes.append(f"applied EXIF orientation {orientation}")
+    if gps is not None:
+        notes.append("stripped GPS tags")
+        off = haversine_m(*gps, *coords)
+        if off > GPS_MISMATCH_M:
+            notes.append(f"warning: the photo's GPS tag is {off / 1000:.1f} km from the answer")
+    size = fit(image.get_size(), MAX_IMAGE_EDGE)
+    if size != image.get_size():
+        image = pygame.transform.smoothscale(image, size)
+
+    os.makedirs(level_dir, exist_ok=True)
+    pygame.image.save(image, image_path)
+    with open(solution_path, "w") as f:
+        f.write(f"{coords[0]},{coords[1]}\n")
+        if tolerance is not None:
+            f.write(f"{tolerance:g}\n")
+    pygame.image.save(make_icon(image), icon_path)
+    image_cache.store(image_path, image_cache.DISPLAY_SIZE, image_cache.scale(image, image_cache.DISPLAY_SIZE))
+
+    spec = {"id": level_id, "points": points, "image": image_path, "solution": solution_path, "icon": icon_path}
+    return spec, notes
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    """ Writes the manifest in its usual layout (one level per line), via a temp file and rename. """
+    cities = []
+    for city, entry in manifest["cities"].items():
+        levels = ",\n".join(" " * 16 + json.dumps(spec) for spec in entry["levels"])
+        cities.append(f'        {json.dumps(city)}: {{\n            "levels": [\n{levels}\n            ]\n        }}')
+    text = '{\n    "version": %d,\n    "cities": {\n%s\n    }\n}\n' % (manifest.get("version", 1), ",\n".join(cities))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".levels_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def ingest(city, photo_dir, points=DEFAULT_POINTS, workers=None, dry_run=False, manifest_path=MANIFEST_PATH):
+    """ Adds every photo in `photo_dir` as a level of `city`. Returns (levels added, problems). """
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if city not in manifest["cities"]:
+        raise ValueError(f"Invalid city name: {city} (the manifest has {', '.join(manifest['cities'])})")
+    levels = manifest["cities"][city]["levels"]
+    next_id = max((spec["id"] for spec in levels), default=0) + 1
+
+    jobs, problems = [], []
+    for name in sorted(os.listdir(photo_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in PHOTO_TYPES:
+            continue
+        try:
+            coords, tolerance = read_sidecar(os.path.join(photo_dir, stem + ".txt"))
+        except ValueError as e:
+            problems.append(f"{name}: {e}")
+            continue
+        jobs.append((os.path.join(photo_dir, name), city, next_id + len(jobs), points, coords, tolerance))
+
+    if dry_run:
+        for source, _, level_id, _, coords, _ in jobs:
+            print(f"{os.path.basename(source)} -> {city} level {level_id} at {coords[0]},{coords[1]}")
+        return 0, problems
+
+    added = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(process_photo, job): job for job in jobs}
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future][0])
+            try:
+                spec, notes = future.result()
+            except (OSError, pygame.error) as e:
+                problems.append(f"{name}: {e}")
+                continue
+            added.append(spec)
+            print(f"{name} -> {spec['image']}" + "".join(f"\n    {note}" for note in notes))
+
+    if added:
+        levels.extend(sorted(added, key=lambda spec: spec["id"]))
+        write_manifest(manifest, manifest_path)
+    return len(added), problems
+
+
+def main(argv):
+    options = {"-p": DEFAULT_POINTS, "-j": None}
+    dry_run = False
+    args = []
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = int(argv.pop(0))
+        elif arg == "-n":
+            dry_run = True
+        else:
+            args.append(arg)
+    if len(args) != 2:
+        print(__doc__)
+        return 2
+
+    try:
+        added, problems = ingest(args[0], args[1], options["-p"], options["-j"], dry_run)
+    except ValueError as e:
+        print(e)
+        return 2
+    for problem in problems:
+        print(f"skipped {problem}")
+    if not dry_run:
+        print(f"added {added} levels to {args[0]}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,281 @@
+import pygame
+
+from asset_cache import assets, load_image
+from audio import audio
+
+TILE_SIZE = 160
+TILE_GAP = 40
+HOVER_SCALE = 1.1
+GRID_RECT = pygame.Rect(100, 80, 600, 440)  # visible area of the grid on city screens
+GRID_PADDING = 20  # room inside GRID_RECT for the enlarged hover tile
+SCROLL_STEP = 60  # pixels per mouse wheel notch
+SCROLLBAR_WIDTH = 6
+CHECK_PATH = 'assets/level_icons/check.png'
+CHECK_MARGIN = 65  # the check mark is the tile size minus this
+
+
+class IconAtlas:
+    """
+    Level icons at one tile size, packed into shared sheet surfaces. `icon()` hands
+    out subsurfaces of the sheets, so a grid of hundreds of levels holds a handful
+    of surfaces rather than one per tile. Levels without icon art share one blank
+    tile (`fallback`) that the grid numbers when it draws it.
+    """
+    COLUMNS, ROWS = 8, 2  # tiles per sheet
+
+    def __init__(self, size):
+        self.size = (int(size[0]), int(size[1]))
+        self._icons = {}  # path -> subsurface
+        self._sheets = []
+        self._next = 0  # slot the next icon goes in
+        self._fallback = None
+
+    def _slot(self):
+        sheet, index = divmod(self._next, self.COLUMNS * self.ROWS)
+        if sheet == len(self._sheets):
+            w, h = self.size
+            self._sheets.append(pygame.Surface((w * self.COLUMNS, h * self.ROWS), pygame.SRCALPHA).convert_alpha())
+        self._next += 1
+        col, row = index % self.COLUMNS, index // self.COLUMNS
+        return self._sheets[sheet].subsurface(pygame.Rect((col * self.size[0], row * self.size[1]), self.size))
+
+    @property
+    def fallback(self):
+        if self._fallback is None:
+            self._fallback = tile = self._slot()
+            rect = tile.get_rect()
+            pygame.draw.rect(tile, (30, 30, 30), rect, border_radius=rect.width // 8)
+            pygame.draw.rect(tile, (255, 255, 255), rect, width=max(2, rect.width // 40), border_radius=rect.width // 8)
+        return self._fallback
+
+    def is_fallback(self, icon):
+        return icon is self._fallback
+
+    def icon(self, path):
+        """ Returns the icon at `path` scaled to the atlas size, or `fallback` if it can't be loaded. """
+        icon = self._icons.get(path)
+        if icon is None:
+            try:
+                image = pygame.transform.scale(load_image(path).convert_alpha(), self.size)
+            except (OSError, pygame.error):  # e.g. a level without its own icon art
+                icon = self.fallback
+            else:
+                icon = self._slot()
+                icon.blit(image, (0, 0))
+            self._icons[path] = icon
+        return icon
+
+
+_atlases = {}
+
+
+def icon_atlas(size):
+    """ Returns the shared IconAtlas for tiles of `size`. """
+    atlas = _atlases.get(size)
+    if atlas is None:
+        atlas = _atlases[size] = IconAtlas(size)
+    return atlas
+
+
+_completed_overlays = {}
+
+
+def completed_overlay(size):
+    """ The dim + check mark drawn over a completed level's tile of `size`, composed once per size. """
+    overlay = _completed_overlays.get(size)
+    if overlay is None:
+        overlay = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        overlay.fill((0, 0, 0, 80))
+        check = assets.image(CHECK_PATH, size=(size[0] - CHECK_MARGIN, size[1] - CHECK_MARGIN))
+        overlay.blit(check, check.get_rect(center=overlay.get_rect().center))
+        _completed_overlays[size] = overlay
+    return overlay
+
+
+class LevelGrid:
+    """
+    A scrollable grid of level tiles. Tile positions are worked out from the scroll
+    offset, so only the rows inside `rect` are ever looked at: hit-testing is
+    arithmetic, and tiles are composed from the atlas into a layer the size of the
+    grid area. Drawing is then a single blit; a tile is only recomposed when its
+    hover or completed state changes, and the whole layer when the grid scrolls.
+    Scroll with the mouse wheel, the arrow keys or Page Up / Page Down.
+    """
+
+    def __init__(self, levels, sound=None, rect=GRID_RECT, tile_size=TILE_SIZE, gap=TILE_GAP, padding=GRID_PADDING,
+                 completed=()):
+        self.levels = levels
+        self.sound = sound
+        self.rect = pygame.Rect(rect)
+        self.tile_size = tile_size
+        self.pitch = tile_size + gap
+        self.padding = padding
+        self.columns = max(1, (self.rect.width - 2 * padding + gap) // self.pitch)
+        self.rows = -(-len(levels) // self.columns)
+        self.content_height = max(0, self.rows * self.pitch - gap) + 2 * padding
+        self.scroll = 0
+        self.hovered = None  # index of the tile under the mouse
+        self.icons = icon_atlas((tile_size, tile_size))
+        hover = int(tile_size * HOVER_SCALE)
+        self.hover_icons = icon_atlas((hover, hover))
+        self.completed = set(completed)  # ids of levels drawn with a check mark
+        self.layer = None  # composed tiles, created on first draw
+        self._layer_scroll = None  # scroll offset the layer was composed at
+        self._tile_states = {}  # index -> (hovered, completed) as composed into the layer
+
+    def set_completed(self, level_ids):
+        """ Updates which levels show as completed; only their tiles get recomposed. """
+        self.completed = set(level_ids)
+
+    @property
+    def max_scroll(self):
+        return max(0, self.content_height - self.rect.height)
+
+    def scroll_to(self, offset):
+        self.scroll = max(0, min(self.max_scroll, int(offset)))
+
+    def visible_range(self):
+        """ Indices of the levels whose rows are at least partly on screen. """
+        top = (self.scroll - self.padding - self.tile_size) // self.pitch + 1  # first row not scrolled off the top
+        bottom = (self.scroll + self.rect.height - self.padding) // self.pitch
+        first = max(0, top) * self.columns
+        last = min(len(self.levels), (bottom + 1) * self.columns)
+        return range(first, max(first, last))
+
+    def visible_levels(self):
+        return [self.levels[i] for i in self.visible_range()]
+
+    def tile_rect(self, index):
+        row, col = divmod(index, self.columns)
+        return pygame.Rect(self.rect.x + self.padding + col * self.pitch,
+                           self.rect.y + self.padding + row * self.pitch - self.scroll,
+                           self.tile_size, self.tile_size)
+
+    def index_at(self, pos):
+        """ The index of the level tile under `pos`, or None. """
+        if not self.rect.collidepoint(pos):
+            return None
+        x = pos[0] - self.rect.x - self.padding
+        y = pos[1] - self.rect.y - self.padding + self.scroll
+        if x < 0 or y < 0:
+            return None
+        col, cx = divmod(x, self.pitch)
+        row, cy = divmod(y, self.pitch)
+        if col >= self.columns or cx >= self.tile_size or cy >= self.tile_size:
+            return None  # in the gap between tiles
+        index = row * self.columns + col
+        return index if index < len(self.levels) else None
+
+    def update(self, events, mouse_pos, mouse_up):
+        """ Handles scrolling and hover; returns the clicked level's id, if any. """
+        page = self.rect.height - self.pitch // 2
+        for event in events:
+            if event.type == pygame.MOUSEWHEEL:
+                self.scroll_to(self.scroll - event.y * SCROLL_STEP)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_DOWN:
+                    self.scroll_to(self.scroll + SCROLL_STEP)
+                elif event.key == pygame.K_UP:
+                    self.scroll_to(self.scroll - SCROLL_STEP)
+                elif event.key == pygame.K_PAGEDOWN:
+                    self.scroll_to(self.scroll + page)
+                elif event.key == pygame.K_PAGEUP:
+                    self.scroll_to(self.scroll - page)
+
+        self.hovered = self.index_at(mouse_pos)
+        if self.hovered is not None and mouse_up:
+            audio.play(self.sound)
+            return self.levels[self.hovered].level_id
+        return None
+
+    def icon(self, index, hover=False):
+        atlas = self.hover_icons if hover else self.icons
+        return atlas.icon(self.levels[index].icon_path)
+
+    def _tile_state(self, index):
+        return index == self.hovered, self.levels[index].level_id in self.completed
+
+    def _compose_tile(self, index, state):
+        """ Draws one tile into the layer (in layer coordinates). """
+        hovered, completed = state
+        atlas = self.hover_icons if hovered else self.icons
+        icon = self.icon(index, hovered)
+        rect = icon.get_rect(center=self.tile_rect(index).move(-self.rect.x, -self.rect.y).center)
+        self.layer.blit(icon, rect)
+        if atlas.is_fallback(icon): # number the blank tile
+            label = str(self.levels[index].level_id)
+            glyphs = assets.glyphs(rect.height // 3, (255, 255, 255))
+            w, h = glyphs.size(label)
+            glyphs.draw(self.layer, label, (rect.centerx - w // 2, rect.centery - h // 2))
+        if completed:
+            self.layer.blit(completed_overlay(rect.size), rect)
+
+    def _cell_rect(self, index):
+        """ Everything a tile can cover, in layer coordinates: the hovered version is the largest. """
+        rect = self.tile_rect(index).move(-self.rect.x, -self.rect.y)
+        w, h = self.hover_icons.size
+        return rect.inflate(w - rect.w, h - rect.h)
+
+    def _clear_tile(self, index):
+        # fill() moves a rect that hangs off the top onto the surface instead of clipping it
+        self.layer.fill((0, 0, 0, 0), self._cell_rect(index).clip(self.layer.get_rect()))
+
+    def compose(self):
+        """ Brings the layer up to date with the scroll offset, hover and completed levels. """
+        if self.layer is None:
+            self.layer = pygame.Surface(self.rect.size, pygame.SRCALPHA).convert_alpha()
+
+        visible = self.visible_range()
+        if self._layer_scroll != self.scroll:
+            self._scroll_layer(visible)
+
+        changed = []
+        for index in visible:
+            state = self._tile_state(index)
+            if self._tile_states.get(index) != state:
+                self._tile_states[index] = state
+                changed.append(index)
+        for index in changed: # clear first: a hovered tile overlaps its cell's margin
+            self._clear_tile(index)
+        for index in changed:
+            self._compose_tile(index, self._tile_states[index])
+
+    def _scroll_layer(self, visible):
+        """
+        Moves the composed tiles by the change in scroll offset. Rows that come into
+        view are left out of `_tile_states`, so compose() draws them as changed tiles.
+        """
+        dy = self.scroll - (self._layer_scroll or 0)
+        self._layer_scroll = self.scroll
+        if self._tile_states and abs(dy) < self.rect.height:
+            self.layer.scroll(0, -dy)
+            # clear the strip that scrolled in, plus the rows that straddle its edge
+            if dy > 0:
+                band = pygame.Rect(0, self.rect.height - dy, self.rect.width, dy)
+            else:
+                band = pygame.Rect(0, 0, self.rect.width, -dy)
+            self.layer.fill((0, 0, 0, 0), band)
+            keep = {}
+            for index, state in self._tile_states.items():
+                if index in visible and not self._cell_rect(index).colliderect(band):
+                    keep[index] = state
+            # tiles that scrolled out can still poke into view (a hovered tile is bigger)
+            for index in set(visible).union(self._tile_states):
+                if index not in keep:
+                    self._clear_tile(index)
+            self._tile_states = keep
+        else:
+            self.layer.fill((0, 0, 0, 0))
+            self._tile_states.clear()
+
+    def draw(self, screen):
+        """ Draws the grid: the composed layer, plus a scroll bar when the levels don't all fit. """
+        self.compose()
+        screen.blit(self.layer, self.rect)
+
+        if self.max_scroll:  # scroll bar along the right edge
+            track = pygame.Rect(self.rect.right - SCROLLBAR_WIDTH, self.rect.y, SCROLLBAR_WIDTH, self.rect.height)
+            thumb_h = max(20, track.height * self.rect.height // self.content_height)
+            thumb_y = track.y + (track.height - thumb_h) * self.scroll // self.max_scroll
+            pygame.draw.rect(screen, (60, 60, 60), track)
+            pygame.draw.rect(screen, (255, 255, 255), (track.x, thumb_y, SCROLLBAR_WIDTH, thumb_h))
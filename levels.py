@@ -0,0 +1,128 @@
+import json, threading
+
+from resources import open_resource
+import image_cache
+from grading import DEFAULT_TOLERANCE_M
+
+MANIFEST_PATH = "levels.json"  # the level data itself lives under osint_levels/
+
+
+class OSINTLevel:
+    """
+    Represents a single OSINT challenge.
+    Holds image path + str answer array, and how close (in metres) an answer has to be.
+    The answer is read from the solution file the first time it is needed.
+    """
+    def __init__(self, city, level_id, points=0, image_path=None, solution_path=None, icon_path=None,
+                 answer=None, tolerance_m=None):
+        self.city = city
+        self.level_id = level_id
+        self.points = points
+        self.image_path = image_path or f"osint_levels/{city}/{level_id}/{level_id}.jpg"
+        self.solution_path = solution_path or f"osint_levels/{city}/{level_id}/{level_id}.txt"
+        self.icon_path = icon_path or f"assets/level_icons/level_{level_id}.png"
+        self._answer = answer.split(",") if isinstance(answer, str) else answer
+        self._tolerance_m = tolerance_m
+
+    @property
+    def answer(self):
+        if self._answer is None:
+            self._answer = self.load_solution()
+        return self._answer
+
+    @property
+    def tolerance_m(self):
+        if self._tolerance_m is None and self._answer is None:
+            self._answer = self.load_solution()  # the solution file may override it
+        return DEFAULT_TOLERANCE_M if self._tolerance_m is None else self._tolerance_m
+
+    def load_solution(self):
+        """ Reads "lat,lon" from the solution file; an optional second line overrides the tolerance radius (metres). """
+        with open_resource(self.solution_path, "r") as f:
+            lat, lon = f.readline().strip().split(",")
+            tolerance = f.readline().strip()
+        if tolerance and self._tolerance_m is None:
+            self._tolerance_m = float(tolerance)
+        return [lat, lon]
+
+    def load_image(self, size):
+        """ Returns the level image scaled to `size`, from the on-disk image cache when it is fresh. """
+        return image_cache.load_scaled(self.image_path, size)
+
+
+class LevelRegistry:
+    """
+    Every city and level, read from one manifest:
+
+        {"cities": {"portland": {"levels": [{"id": 1, "points": 1000,
+                                             "image": ..., "solution": ..., "icon": ...}, ...]}, ...}}
+
+    Paths are optional and default to the osint_levels/<city>/<id>/ layout; a level can
+    carry its "answer" ("lat,lon") and "tolerance_m" inline instead of a solution file.
+    The manifest is parsed on first use and each city's OSINTLevel objects are built the
+    first time that city is asked for, so startup cost doesn't grow with the level count.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._cities = None  # city -> manifest entry, in manifest order
+        self._levels = {}  # city -> [OSINTLevel, ...]
+        self._index = {}  # (city, level_id) -> OSINTLevel
+        self._lock = threading.Lock()  # cities can be first asked for from the export thread
+
+    def _manifest(self):
+        if self._cities is None:
+            with open_resource(self.path, "r") as f:
+                self._cities = json.load(f)["cities"]
+        return self._cities
+
+    def cities(self):
+        """ City names in manifest order. """
+        return list(self._manifest())
+
+    def levels(self, city):
+        """ Returns the city's levels in manifest order. """
+        levels = self._levels.get(city)
+        if levels is None:
+            with self._lock:
+                levels = self._levels.get(city) or self._build(city)
+        return levels
+
+    def _build(self, city):
+        entry = self._manifest().get(city)
+        if entry is None:
+            raise ValueError(f"Invalid city name: {city}")
+        levels = [
+            OSINTLevel(
+                city, spec["id"],
+                points=spec.get("points", 0),
+                image_path=spec.get("image"),
+                solution_path=spec.get("solution"),
+                icon_path=spec.get("icon"),
+                answer=spec.get("answer"),
+                tolerance_m=spec.get("tolerance_m"),
+            )
+            for spec in entry["levels"]
+        ]
+        for level in levels:
+            self._index[(city, level.level_id)] = level
+        self._levels[city] = levels
+        return levels
+
+    def level(self, city, level_id):
+        """ Returns one level by (city, id). Raises KeyError if there is no such level. """
+        level = self._index.get((city, level_id))
+        if level is None:
+            self.levels(city)
+            level = self._index[(city, level_id)]
+        return level
+
+    def reload(self):
+        """ Forgets everything read so far; the manifest is read again on next use. """
+        with self._lock:
+            self._cities = None
+            self._levels.clear()
+            self._index.clear()
+
+
+registry = LevelRegistry()
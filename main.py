@@ -1,73 +1,156 @@
+import time
+LAUNCHED = time.perf_counter()  # startup timings are measured from here
+
 from screens import *
 import pygame, sys, os
-
-def resource_path(relative_path):
-    """ Get absolute path to resource, works with PyInstaller """
+from profiler import profiler
+from levels import registry
+from export import exports
+from startup import BackgroundLoader, SplashScene
+from audio import audio
+import game, replay
+
+def open_window():
+    """
+    Opens the window with a fixed 800x600 logical surface. With SCALED, SDL stretches
+    (and letterboxes) that surface to whatever size the window is resized to and maps
+    mouse positions back, so layouts and cached backgrounds, icons and text never
+    have to be rebuilt on resize.
+    """
     try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+        return pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED | pygame.RESIZABLE)
+    except pygame.error: # no renderer for SCALED, use a fixed-size window
+        return pygame.display.set_mode((WIDTH, HEIGHT))
+
+
+def show_splash(screen, scheduler, loader):
+    """ Runs the splash until the loader is done. Returns False if the window was closed. """
+    splash = SplashScene(loader)
+    splash.enter()
+    first = True
+    while not loader.done:
+        profiler.begin_frame()
+        try: # splash frames are profiled too, so their draw and the loader's io aren't charged to the first game frame
+            with profiler.phase("events"):
+                events = scheduler.get_events()
+            if any(event.type == pygame.QUIT for event in events):
+                return False
+            splash.update([])
+            splash.render(screen)
+        finally:
+            profiler.end_frame()
+        if first:
+            profiler.mark("first_frame")
+            first = False
+        scheduler.tick(splash.wake_in())
+    return True
 
 
 def main():
-    WIDTH, HEIGHT = 800, 600
+    profiler.launched_at(LAUNCHED)
+    session = replay.from_environment() # OSINT_RECORD / OSINT_REPLAY, see replay.py
+    if isinstance(session, replay.InputReplayer): # headless, against a copy of the recorded progress
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        game.DB_PATH = session.progress_db()
+    if session:
+        session.install() # before any Clock is made
     pygame.init()
-    pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = open_window()
     pygame.scrap.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Christmas OSINT Adventure")
-    clock = pygame.time.Clock()
+    scheduler = FrameScheduler(60) # sleeps while the screen is static
     game_state = GameState.TITLE
 
-    # Load sounds
-    pygame.mixer.music.load('assets/sounds/soulomon-b-the-yume-collective-midnight-miracles-436039.mp3')
-    pygame.mixer.music.play(-1)  # play indefinitely
-    click_sound = pygame.mixer.Sound("assets/sounds/90s-game-ui-6-185099.wav")
-    points_sound = pygame.mixer.Sound("assets/sounds/get-coin-351945.wav")
-
-    player = load_game()
+    # audio, the save and the big backgrounds load behind the splash
+    loader = BackgroundLoader([
+        ("music", lambda: audio.play_music("theme")),  # loops until the game quits
+        ("sounds", audio.load),
+        ("save", load_game),
+        ("backgrounds", warm_city_backgrounds),
+    ])
+    if not show_splash(screen, scheduler, loader):
+        if session:
+            session.close()
+        pygame.quit()
+        sys.exit()
+    player = loader.result()["save"]
+    if session:
+        session.start(player) # the splash isn't part of the log
 
     # if not player.name or player.name.strip() == "":
     #     game_state = GameState.NAME
     # else:
     #     game_state = GameState.TITLE
 
+    scenes = ScreenScenes(player, "click") # each screen is built once, then reused
+    stack = SceneStack()
+    stack.push(scenes.get(game_state))
+    profiler.mark("ready")
+
+    transition = None # CircleTransition into a city, if one is running
+    dt = 0
+
     running = True
     while running:
-        events = pygame.event.get()
+        profiler.begin_frame()
+        with profiler.phase("events"):
+            events = scheduler.get_events()
         for event in events: # closing window
             if event.type == pygame.QUIT:
-                player.save_game()
                 running = False
 
-            if event.type == pygame.VIDEORESIZE: # resizing
-                WIDTH, HEIGHT = event.w, event.h
-                screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-
-        if game_state == GameState.TITLE:
-            game_state = title_screen(screen, click_sound)
-
-        elif game_state == GameState.NEWGAME:
-            game_state = play_level(screen, player, click_sound)
-
-        elif game_state == GameState.PORTLAND:
-            game_state = portland_screen(screen, player, click_sound)
-
-        elif game_state == GameState.EUGENE:
-            game_state = eugene_screen(screen, player, click_sound)
-
-        elif game_state == GameState.CORVALLIS:
-            game_state = corvallis_screen(screen, player, click_sound)
-
-        elif game_state == GameState.QUIT:
-            player.save_game()  # save the current game
+            if event.type == pygame.VIDEORESIZE: # resizing: SDL rescales the logical surface, just present it again
+                stack.top.dirty.add_all()
+
+        if not running:
+            profiler.end_frame()
+            break
+        audio.update() # music fades
+        if profiler.handle(events): # F3 toggles the profiling overlay
+            stack.top.dirty.add_all()
+
+        if transition: # the transition gets this frame's input
+            transition.update(events, dt)
+            if transition.cancelled: # back to the screen the city was picked on
+                stack.goto(transition.origin)
+                stack.top.dirty.add_all()
+                transition = None
+            elif transition.finished:
+                stack.goto(scenes.get(transition.city))
+                transition = None
+            else:
+                transition.draw(screen)
+            profiler.end_frame()
+            dt = scheduler.tick(0) # animating
+            continue
+
+        with profiler.phase("update"):
+            action = stack.top.update(events)
+        if action == GameState.QUIT:
             running = False
-
-        pygame.display.flip()
-        clock.tick(60)
-
+        elif isinstance(action, Scene): # e.g. a level page
+            stack.push(action)
+        elif action == GameState.BACK: # e.g. a level page back to its city
+            stack.pop()
+        elif action in registry.cities(): # a city picked on the map: reveal it with a transition first
+            transition = CircleTransition(action, origin=stack.top)
+        elif action is not None:
+            stack.goto(scenes.get(action))
+        else:
+            stack.top.render(screen)
+
+        profiler.end_frame()
+        dt = scheduler.tick(soonest(stack.top.wake_in(), audio.wake_in()))
+
+    stack.clear() # lets the top scene finish, e.g. award points still in their popup
+    player.flush()  # save the current game
+    player.close()
+    if session:
+        session.close()
+    profiler.dump_on_exit()
+    level_images.shutdown()
+    exports.shutdown() # let a running export finish writing
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_cache import assets
+
+
+class ImagePrefetcher:
+    """
+    Decodes and pre-scales level images on a pool of worker threads.
+    Finished images are converted on the main thread and handed to the shared asset cache,
+    so `get()` never blocks the frame loop.
+    """
+
+    def __init__(self, size, workers=4):
+        self.size = size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._futures = {}  # image path -> Future returning an unconverted, scaled Surface
+
+    def prefetch(self, levels):
+        """ Queues every level whose image isn't already cached or in flight. """
+        for level in levels:
+            path = level.image_path
+            if path in self._futures or assets.cached_image(path, size=self.size, smooth=True):
+                continue
+            # pygame releases the GIL while decoding and scaling
+            self._futures[path] = self._pool.submit(level.load_image, self.size)
+
+    def get(self, level):
+        """ Returns the display-ready image for `level`, or None while it is still being decoded. """
+        path = level.image_path
+        image = assets.cached_image(path, size=self.size, smooth=True)
+        if image is not None:
+            return image
+
+        future = self._futures.get(path)
+        if future is None:
+            self.prefetch([level])
+            return None
+        if not future.done():
+            return None
+
+        del self._futures[path]
+        image = future.result().convert_alpha()  # re-raises any load error
+        assets.put_image(image, path, size=self.size, smooth=True)
+        return image
+
+    def shutdown(self):
+        """ Drops queued work and stops the worker threads. """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._futures.clear()
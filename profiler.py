@@ -0,0 +1,141 @@
+import pygame
+import csv, json, os, threading, time
+from contextlib import contextmanager
+
+PHASES = ("events", "update", "draw", "flip", "io")
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_RECT = pygame.Rect(545, 50, 250, 20 + 16 * (len(PHASES) + 3))
+
+
+class FrameProfiler:
+    """
+    Per-frame timings for each phase of the frame loop, kept in a fixed-size ring buffer.
+    Toggle the on-screen overlay with F3. Set OSINT_PROFILE=<file>.json or <file>.csv
+    to dump the samples when the game exits. Startup milestones (`mark`) are kept
+    separately, in ms since launch.
+    """
+
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.frames = [None] * capacity  # ring buffer of {"frame": ms, phase: ms, ...}
+        self.count = 0  # total frames recorded
+        self.skipped = 0  # frames the scheduler skipped while idle
+        self.visible = False
+        self.startup = {}  # milestone -> ms since launch
+        self._launched = time.perf_counter()
+        self._current = dict.fromkeys(PHASES, 0.0)
+        self._frame_start = None
+        self._lock = threading.Lock()  # "io" can be recorded from the save thread
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        with self._lock:
+            sample = {phase: ms for phase, ms in self._current.items()}
+            self._current = dict.fromkeys(PHASES, 0.0)
+        sample["frame"] = (time.perf_counter() - self._frame_start) * 1000
+        self.frames[self.count % self.capacity] = sample
+        self.count += 1
+        self._frame_start = None
+
+    def launched_at(self, t):
+        """ Sets the perf_counter() time startup milestones are measured from. """
+        self._launched = t
+
+    def mark(self, name):
+        """ Records a startup milestone, e.g. "first_frame". """
+        self.startup[name] = (time.perf_counter() - self._launched) * 1000
+
+    def count_skipped(self, frames):
+        self.skipped += frames
+
+    def record(self, phase, ms):
+        with self._lock:
+            self._current[phase] = self._current.get(phase, 0.0) + ms
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def samples(self):
+        """ Returns the buffered samples, oldest first. """
+        if self.count <= self.capacity:
+            return self.frames[:self.count]
+        start = self.count % self.capacity
+        return self.frames[start:] + self.frames[:start]
+
+    def percentiles(self, key="frame", points=(50, 95, 99)):
+        values = sorted(sample[key] for sample in self.samples())
+        if not values:
+            return {p: 0.0 for p in points}
+        return {p: values[min(len(values) - 1, int(len(values) * p / 100))] for p in points}
+
+    def summary(self):
+        samples = self.samples()
+        return {
+            "frames": len(samples),
+            "skipped_frames": self.skipped,
+            "startup_ms": dict(self.startup),
+            "frame_ms": self.percentiles(),
+            "mean_ms": {phase: sum(s[phase] for s in samples) / len(samples) if samples else 0.0
+                        for phase in PHASES},
+        }
+
+    def handle(self, events):
+        """ Toggles the overlay on F3. Returns True if it was toggled (the screen needs a full redraw). """
+        toggled = False
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+                self.visible = not self.visible
+                toggled = True
+        return toggled
+
+    def draw_overlay(self, screen):
+        """ Draws the overlay (if visible) and returns the rect it covers, or None. """
+        if not self.visible:
+            return None
+        from asset_cache import assets
+
+        summary = self.summary()
+        p = summary["frame_ms"]
+        lines = [f"frame p50 {p[50]:.1f}  p95 {p[95]:.1f}  p99 {p[99]:.1f} ms"]
+        lines += [f"{phase:<7} {ms:6.2f} ms" for phase, ms in summary["mean_ms"].items()]
+        lines.append(f"{summary['frames']} frames, {summary['skipped_frames']} skipped idle")
+        startup = summary["startup_ms"]
+        lines.append(f"first frame {startup.get('first_frame', 0):.0f}  ready {startup.get('ready', 0):.0f} ms")
+
+        pygame.draw.rect(screen, (0, 0, 0), OVERLAY_RECT)
+        glyphs = assets.glyphs(16, (0, 255, 0))
+        for i, line in enumerate(lines):
+            glyphs.draw(screen, line, (OVERLAY_RECT.x + 8, OVERLAY_RECT.y + 8 + i * 16))
+        return OVERLAY_RECT
+
+    def dump(self, path):
+        """ Writes the buffered samples to `path` as JSON or CSV (by extension). """
+        samples = self.samples()
+        columns = ("frame",) + PHASES
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for sample in samples:
+                    writer.writerow([f"{sample.get(c, 0.0):.4f}" for c in columns])
+        else:
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(), "samples": samples}, f, indent=1)
+
+    def dump_on_exit(self):
+        """ Dumps to $OSINT_PROFILE if it is set. """
+        path = os.environ.get("OSINT_PROFILE")
+        if path:
+            self.dump(path)
+
+
+profiler = FrameProfiler()
@@ -0,0 +1,251 @@
+import json, os, sqlite3, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import profiler
+
+DB_PATH = "progress.db"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    points INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_played REAL
+);
+CREATE INDEX IF NOT EXISTS profiles_by_points ON profiles (points DESC);
+
+CREATE TABLE IF NOT EXISTS completions (
+    profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    city TEXT NOT NULL,
+    level_id INTEGER NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (profile_id, city, level_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS completions_by_level ON completions (city, level_id);
+
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    city TEXT NOT NULL,
+    level_id INTEGER NOT NULL,
+    submission TEXT NOT NULL,
+    distance_m REAL,
+    correct INTEGER NOT NULL,
+    attempted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_by_level ON attempts (profile_id, city, level_id);
+"""
+
+
+class ProgressDB:
+    """
+    Player profiles, completed levels and answer attempts in an embedded SQLite
+    database (WAL journal, so reads never wait on a write in progress).
+    Methods run immediately on the calling thread; `submit()` queues one on the
+    database's writer thread instead, so the frame loop never waits on disk.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()  # one connection, shared by the main and writer threads
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress")
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits can be lost on power failure
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def _execute(self, sql, params=()):
+        """ Runs one statement and returns its rows, read before the lock is released. """
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _transaction(self, fn):
+        """ Runs fn(conn) inside BEGIN IMMEDIATE ... COMMIT, rolling back if it raises. """
+        with self._lock, profiler.phase("io"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+
+    def submit(self, fn, *args):
+        """ Queues fn(*args) on the writer thread; returns its Future. """
+        return self._writer.submit(fn, *args)
+
+    def wait(self):
+        """ Blocks until every queued write has finished. """
+        self._writer.submit(lambda: None).result()
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+
+    def get_meta(self, key, default=None):
+        rows = self._execute("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else default
+
+    def set_meta(self, key, value):
+        self._execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                      (key, str(value)))
+
+
+    def create_profile(self, name="", points=0):
+        return self._transaction(lambda conn: conn.execute(
+            "INSERT INTO profiles (name, points, created_at) VALUES (?, ?, ?)", (name, points, time.time())).lastrowid)
+
+    def profiles(self):
+        """ All profiles, oldest first, as sqlite3.Row (id, name, points, created_at, last_played). """
+        return self._execute("SELECT * FROM profiles ORDER BY id")
+
+    def profile(self, profile_id):
+        rows = self._execute("SELECT * FROM profiles WHERE id = ?", (profile_id,))
+        return rows[0] if rows else None
+
+    def update_profile(self, profile_id, name, points):
+        with profiler.phase("io"):
+            self._execute("UPDATE profiles SET name = ?, points = ?, last_played = ? WHERE id = ?",
+                          (name, points, time.time(), profile_id))
+
+    def delete_profile(self, profile_id):
+        self._execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+
+    @property
+    def active_profile(self):
+        """ The profile the game opens with (set with `use`), or the oldest one. """
+        profile_id = self.get_meta("active_profile")
+        if profile_id is not None and self.profile(int(profile_id)) is not None:
+            return int(profile_id)
+        rows = self._execute("SELECT id FROM profiles ORDER BY id LIMIT 1")
+        return rows[0]["id"] if rows else None
+
+    def use(self, profile_id):
+        self.set_meta("active_profile", profile_id)
+
+
+    def completed_levels(self, profile_id):
+        """ Returns {city: {level_id, ...}} of the profile's completed levels. """
+        levels = {}
+        for row in self._execute("SELECT city, level_id FROM completions WHERE profile_id = ?", (profile_id,)):
+            levels.setdefault(row["city"], set()).add(row["level_id"])
+        return levels
+
+    def award(self, profile_id, city, level_id, points):
+        """
+        Marks a level completed and adds its points in one transaction. Returns False
+        (and changes nothing) if the profile had already completed it.
+        """
+        def award(conn):
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO completions (profile_id, city, level_id, points, completed_at) VALUES (?, ?, ?, ?, ?)",
+                (profile_id, city, level_id, points, time.time())).rowcount
+            if inserted:
+                conn.execute("UPDATE profiles SET points = points + ?, last_played = ? WHERE id = ?",
+                             (points, time.time(), profile_id))
+            return bool(inserted)
+        return self._transaction(award)
+
+    def record_attempt(self, profile_id, city, level_id, submission, distance_m, correct):
+        with profiler.phase("io"):
+            self._execute(
+                "INSERT INTO attempts (profile_id, city, level_id, submission, distance_m, correct, attempted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (profile_id, city, level_id, submission, distance_m, int(bool(correct)), time.time()))
+
+
+    def completions_per_city(self, profile_id=None):
+        """ {city: completed level count}, for one profile or across all of them. """
+        if profile_id is None:
+            rows = self._execute("SELECT city, COUNT(*) AS n FROM completions GROUP BY city")
+        else:
+            rows = self._execute("SELECT city, COUNT(*) AS n FROM completions WHERE profile_id = ? GROUP BY city",
+                                 (profile_id,))
+        return {row["city"]: row["n"] for row in rows}
+
+    def top_scores(self, limit=10):
+        """ [(name, points), ...], highest first. """
+        rows = self._execute("SELECT name, points FROM profiles ORDER BY points DESC, id LIMIT ?", (limit,))
+        return [(row["name"], row["points"]) for row in rows]
+
+    def attempt_stats(self, city, level_id):
+        """ (attempts, correct attempts, players who solved it) for one level. """
+        row = self._execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(correct), 0) AS correct, COUNT(DISTINCT CASE WHEN correct THEN profile_id END) AS solvers "
+            "FROM attempts WHERE city = ? AND level_id = ?", (city, level_id))[0]
+        return row["n"], row["correct"], row["solvers"]
+
+
+    def import_json(self, path):
+        """
+        Imports a save_data.json ({"save_file": {"points", "name", "levels": {city: {id: "completed"}}}})
+        as a new profile and returns its id. Each file is only imported once; importing it
+        again returns None.
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+        save = data.get("save_file", data)
+        key = "imported:" + os.path.abspath(path)
+
+        def import_save(conn):
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return None
+            now = time.time()
+            profile_id = conn.execute("INSERT INTO profiles (name, points, created_at, last_played) VALUES (?, ?, ?, ?)",
+                                      (save.get("name", ""), int(save.get("points", 0)), now, now)).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO completions (profile_id, city, level_id, points, completed_at) VALUES (?, ?, ?, 0, ?)",
+                [(profile_id, city, int(level_id), now)
+                 for city, levels in save.get("levels", {}).items()
+                 for level_id, state in levels.items() if state == "completed"])
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(profile_id)))
+            return profile_id
+        return self._transaction(import_save)
+
+
+def main(argv):
+    """ python progress.py [list | create NAME | use ID | delete ID | import FILE | stats] """
+    db = ProgressDB()
+    command = argv[0] if argv else "list"
+    if command == "list":
+        active = db.active_profile
+        for row in db.profiles():
+            print(f"{'*' if row['id'] == active else ' '} {row['id']:>3}  {row['name'] or '(no name)':<20} {row['points']:>7} pts")
+    elif command == "create":
+        print(db.create_profile(" ".join(argv[1:])))
+    elif command == "use":
+        db.use(int(argv[1]))
+    elif command == "delete":
+        db.delete_profile(int(argv[1]))
+    elif command == "import":
+        profile_id = db.import_json(argv[1])
+        print(profile_id if profile_id is not None else "already imported")
+    elif command == "stats":
+        print("completions per city:", db.completions_per_city())
+        for name, points in db.top_scores():
+            print(f"{name or '(no name)':<20} {points:>7}")
+    else:
+        print(main.__doc__.strip())
+        return 2
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
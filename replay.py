@@ -0,0 +1,280 @@
+"""
+Input recording and replay. Set OSINT_RECORD=<file> to log the input a session reads,
+and OSINT_REPLAY=<file> to play it back headless, without waiting between frames.
+Combine with OSINT_PROFILE=<file> to compare frame times between versions on the same session.
+
+Everything the game reads input from goes through pygame.event.get/wait,
+pygame.mouse.get_pos, pygame.time.get_ticks and pygame.time.Clock, so those are
+what get recorded and stubbed. Each event.get() call is one frame in the log, with
+the milliseconds since the previous one. An event that wakes the scheduler from
+event.wait() is stored with the frame that follows it, because that is the frame
+that hands it to the scene. The player's progress when recording starts goes in the
+header, and a replay runs against a throwaway copy of it. Left out of the log: the
+clipboard (ctrl+V), and background work such as image prefetching, whose timing can
+still differ from frame to frame.
+
+File layout (little-endian):
+
+    header  "OSIR", version u8, JSON length u32, JSON {"ticks", "pos", "player"}
+    frame   flags u8, dt u16, [x i16, y i16 if MOVED], [count u16, events if EVENTS]
+    event   type u16, then the fields in EVENT_FIELDS for that type
+"""
+
+import json, os, struct, tempfile
+import pygame
+
+from progress import ProgressDB
+
+MAGIC = b"OSIR"
+VERSION = 1
+MOVED, EVENTS = 1, 2  # frame flags
+
+# event type -> (attribute, kind) written for it; other event types aren't logged
+EVENT_FIELDS = {
+    pygame.QUIT: (),
+    pygame.VIDEOEXPOSE: (),
+    pygame.VIDEORESIZE: (("size", "point"),),
+    pygame.MOUSEMOTION: (("pos", "point"), ("rel", "point"), ("buttons", "buttons")),
+    pygame.MOUSEBUTTONDOWN: (("pos", "point"), ("button", "u8")),
+    pygame.MOUSEBUTTONUP: (("pos", "point"), ("button", "u8")),
+    pygame.MOUSEWHEEL: (("x", "i16"), ("y", "i16"), ("flipped", "u8")),
+    pygame.KEYDOWN: (("key", "i32"), ("mod", "u16"), ("scancode", "u16"), ("unicode", "str")),
+    pygame.KEYUP: (("key", "i32"), ("mod", "u16"), ("scancode", "u16")),
+    pygame.TEXTINPUT: (("text", "str"),),
+}
+FORMATS = {"point": "<hh", "i16": "<h", "u8": "<B", "u16": "<H", "i32": "<i"}
+DEFAULTS = {"point": (0, 0), "buttons": (0, 0, 0), "i16": 0, "u8": 0, "u16": 0, "i32": 0, "str": ""}
+
+
+def encode_event(event, out):
+    """ Appends `event` to the bytearray `out`. """
+    out += struct.pack("<H", event.type)
+    for name, kind in EVENT_FIELDS[event.type]:
+        value = getattr(event, name, DEFAULTS[kind])
+        if kind == "str":
+            data = value.encode("utf-8")[:255]
+            out += struct.pack("<B", len(data)) + data
+        elif kind == "buttons":
+            out += struct.pack("<B", sum(1 << i for i, pressed in enumerate(value[:8]) if pressed))
+        elif kind == "point":
+            out += struct.pack("<hh", *value)
+        else:
+            out += struct.pack(FORMATS[kind], int(value))
+
+
+def decode_event(data, offset):
+    """ Reads one event at `offset`; returns (event, offset after it). """
+    (event_type,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    attrs = {}
+    for name, kind in EVENT_FIELDS[event_type]:
+        if kind == "str":
+            length = data[offset]
+            attrs[name] = data[offset + 1:offset + 1 + length].decode("utf-8")
+            offset += 1 + length
+        elif kind == "buttons":
+            attrs[name] = tuple((data[offset] >> i) & 1 for i in range(3))
+            offset += 1
+        else:
+            fmt = FORMATS[kind]
+            value = struct.unpack_from(fmt, data, offset)
+            attrs[name] = value if kind == "point" else value[0]
+            offset += struct.calcsize(fmt)
+    if event_type == pygame.VIDEORESIZE:
+        attrs["w"], attrs["h"] = attrs["size"]
+    return pygame.event.Event(event_type, attrs), offset
+
+
+def player_snapshot(player):
+    return {
+        "name": player.name,
+        "points": player.points,
+        "levels": {city: sorted(levels) for city, levels in player.levels.items()},
+    }
+
+
+class InputRecorder:
+    """
+    Logs the input the game reads to `path`. `install()` hooks pygame's event calls;
+    nothing is written until `start(player)`, so the splash isn't part of the log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._file = None
+        self._pending = []  # events returned by event.wait(), logged with the next frame
+        self._saved = None
+
+    def install(self):
+        self._saved = pygame.event.get, pygame.event.wait
+        pygame.event.get, pygame.event.wait = self._get, self._wait
+
+    def start(self, player):
+        self._ticks = pygame.time.get_ticks()
+        self._pos = pygame.mouse.get_pos()
+        header = json.dumps({"ticks": self._ticks, "pos": self._pos, "player": player_snapshot(player)}).encode("utf-8")
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC + struct.pack("<BI", VERSION, len(header)) + header)
+
+    def _wait(self, *args, **kwargs):
+        event = self._saved[1](*args, **kwargs)
+        if self._file and event.type in EVENT_FIELDS:
+            self._pending.append(event)
+        return event
+
+    def _get(self, *args, **kwargs):
+        events = self._saved[0](*args, **kwargs)
+        if self._file:
+            self._write_frame(self._pending + [event for event in events if event.type in EVENT_FIELDS])
+            self._pending = []
+        return events
+
+    def _write_frame(self, events):
+        ticks, pos = pygame.time.get_ticks(), pygame.mouse.get_pos()
+        flags = (MOVED if pos != self._pos else 0) | (EVENTS if events else 0)
+        out = bytearray(struct.pack("<BH", flags, min(0xFFFF, ticks - self._ticks)))
+        if flags & MOVED:
+            out += struct.pack("<hh", *pos)
+        if flags & EVENTS:
+            out += struct.pack("<H", len(events))
+            for event in events:
+                encode_event(event, out)
+        self._file.write(out)
+        self._ticks, self._pos = ticks, pos
+        self.frames += 1
+
+    def close(self):
+        if self._saved:
+            pygame.event.get, pygame.event.wait = self._saved
+            self._saved = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ReplayClock:
+    """ Stand-in for pygame.time.Clock that never sleeps; tick() returns the recorded time since the last tick. """
+
+    def __init__(self):
+        self._last = pygame.time.get_ticks()
+
+    def tick(self, framerate=0):
+        now = pygame.time.get_ticks()
+        elapsed, self._last = now - self._last, now
+        return elapsed
+
+    def get_fps(self):
+        return 0.0
+
+
+class InputReplayer:
+    """
+    Plays a log written by InputRecorder back through the same pygame calls. Until
+    `start()` they behave normally; after it every event.get() returns the next logged
+    frame, event.wait() returns at once, and a QUIT follows the last frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not an input log")
+        version, length = struct.unpack_from("<BI", data, 4)
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported input log version {version}")
+        self.header = json.loads(data[9:9 + length])
+        self.frames = self._decode_frames(data, 9 + length)
+        self.frame = 0
+        self.started = False
+        self._ticks = self.header["ticks"]
+        self._pos = tuple(self.header["pos"])
+        self._saved = None
+        self._tmp = None
+
+    def _decode_frames(self, data, offset):
+        """ Decodes every frame up front, so replay timings don't include parsing. """
+        frames, ticks, pos = [], self.header["ticks"], tuple(self.header["pos"])
+        while offset < len(data):
+            flags, dt = struct.unpack_from("<BH", data, offset)
+            offset += 3
+            ticks += dt
+            if flags & MOVED:
+                pos = struct.unpack_from("<hh", data, offset)
+                offset += 4
+            events = []
+            if flags & EVENTS:
+                (count,) = struct.unpack_from("<H", data, offset)
+                offset += 2
+                for _ in range(count):
+                    event, offset = decode_event(data, offset)
+                    events.append(event)
+            frames.append((ticks, pos, events))
+        return frames
+
+    def progress_db(self):
+        """ Creates a throwaway progress database holding the recorded player; returns its path. """
+        self._tmp = tempfile.TemporaryDirectory(prefix="osint_replay_")
+        path = os.path.join(self._tmp.name, "progress.db")
+        snapshot = self.header["player"]
+        db = ProgressDB(path)
+        profile_id = db.create_profile(snapshot["name"], snapshot["points"])
+        for city, levels in snapshot["levels"].items():
+            for level_id in levels:
+                db.award(profile_id, city, level_id, 0)
+        db.close()
+        return path
+
+    def install(self):
+        self._saved = (pygame.event.get, pygame.event.wait, pygame.mouse.get_pos, pygame.time.get_ticks,
+                       pygame.time.Clock)
+        pygame.event.get, pygame.event.wait = self._get, self._wait
+        pygame.mouse.get_pos, pygame.time.get_ticks = self._get_pos, self._get_ticks
+        pygame.time.Clock = ReplayClock
+
+    def start(self, player=None):
+        self.started = True
+
+    @property
+    def finished(self):
+        return self.frame >= len(self.frames)
+
+    def _get(self, *args, **kwargs):
+        if not self.started:
+            return self._saved[0](*args, **kwargs)
+        self._saved[0]()  # keep the OS event queue drained
+        if self.finished:
+            return [pygame.event.Event(pygame.QUIT)]
+        self._ticks, self._pos, events = self.frames[self.frame]
+        self.frame += 1
+        return list(events)
+
+    def _wait(self, *args, **kwargs):
+        if not self.started:
+            return self._saved[1](*args, **kwargs)
+        return pygame.event.Event(pygame.NOEVENT)
+
+    def _get_pos(self):
+        return self._pos if self.started else self._saved[2]()
+
+    def _get_ticks(self):
+        return self._ticks  # the recorded start time until start(), so clocks made before it agree
+
+    def close(self):
+        if self._saved:
+            (pygame.event.get, pygame.event.wait, pygame.mouse.get_pos, pygame.time.get_ticks,
+             pygame.time.Clock) = self._saved
+            self._saved = None
+        if self._tmp:
+            self._tmp.cleanup()
+            self._tmp = None
+
+
+def from_environment():
+    """ An InputReplayer for $OSINT_REPLAY or an InputRecorder for $OSINT_RECORD, else None. """
+    if os.environ.get("OSINT_REPLAY"):
+        return InputReplayer(os.environ["OSINT_REPLAY"])
+    if os.environ.get("OSINT_RECORD"):
+        return InputRecorder(os.environ["OSINT_RECORD"])
+    return None
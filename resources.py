@@ -0,0 +1,168 @@
+"""
+Resource access for loose files and the packed asset bundle.
+
+In a build, every file under assets/ and osint_levels/ is packed into one
+assets.pak (an offset index followed by the file data), which is memory-mapped
+and read without copying. Without a bundle, or with OSINT_LOOSE_ASSETS=1,
+files are read from the loose directories as before.
+
+    python resources.py pack [-o assets.pak] [dir ...]
+"""
+import io, json, mmap, os, struct, sys
+
+BUNDLE_NAME = "assets.pak"
+BUNDLE_DIRS = ("assets", "osint_levels")
+MAGIC = b"OSINTPK1"
+_HEADER = struct.Struct("<8sI")  # magic, index length
+
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works with PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def _key(path):
+    """ Normalizes a relative path to the form used in the bundle index. """
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+class BundleFile(io.RawIOBase):
+    """ Read-only file object over one entry of a memory-mapped bundle (no copies). """
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class Bundle:
+    """ A packed asset archive, memory-mapped on open. """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        start = _HEADER.size
+        self.index = json.loads(bytes(self._map[start:start + index_length]))  # path -> [offset, length, mtime_ns]
+        self._data = memoryview(self._map)[start + index_length:]
+
+    def __contains__(self, path):
+        return _key(path) in self.index
+
+    def view(self, path):
+        """ Returns a zero-copy memoryview of the file's bytes. """
+        offset, length, _ = self.index[_key(path)]
+        return self._data[offset:offset + length]
+
+    def open(self, path):
+        return BundleFile(self.view(path))
+
+    def mtime(self, path):
+        return self.index[_key(path)][2]
+
+
+_bundle = None
+_bundle_checked = False
+
+
+def get_bundle():
+    """ Returns the packed bundle, or None when running from loose files. """
+    global _bundle, _bundle_checked
+    if not _bundle_checked:
+        _bundle_checked = True
+        path = resource_path(BUNDLE_NAME)
+        if os.environ.get("OSINT_LOOSE_ASSETS") != "1" and os.path.exists(path):
+            _bundle = Bundle(path)
+    return _bundle
+
+
+def open_resource(path, mode="rb"):
+    """ Opens a game resource by its relative path (e.g. 'assets/coin.png'). """
+    bundle = get_bundle()
+    if bundle is not None and path in bundle:
+        f = bundle.open(path)
+        if "b" in mode:
+            return f
+        return io.TextIOWrapper(io.BufferedReader(f), encoding="utf-8")
+    return open(resource_path(path), mode)
+
+
+def resource_mtime(path):
+    """ Returns the modification time (ns) of a resource, or None if it doesn't exist. """
+    bundle = get_bundle()
+    if bundle is not None and path in bundle:
+        return bundle.mtime(path)
+    try:
+        return os.stat(resource_path(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def pack(directories=BUNDLE_DIRS, output=BUNDLE_NAME):
+    """ Packs every file under `directories` into a single bundle at `output`. """
+    files = []
+    for directory in directories:
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            files.extend(os.path.join(root, name) for name in sorted(names))
+
+    index = {}
+    offset = 0
+    for path in files:
+        stat = os.stat(path)
+        index[_key(path)] = [offset, stat.st_size, stat.st_mtime_ns]
+        offset += stat.st_size
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+    tmp_output = output + ".tmp"
+    with open(tmp_output, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, len(index_bytes)))
+        out.write(index_bytes)
+        for path in files:
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    out.write(chunk)
+    os.replace(tmp_output, output)
+    return len(files), offset
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "pack":
+        print(__doc__)
+        sys.exit(2)
+    args = args[1:]
+    output = BUNDLE_NAME
+    if len(args) >= 2 and args[0] == "-o":
+        output, args = args[1], args[2:]
+    count, size = pack(args or BUNDLE_DIRS, output)
+    print(f"packed {count} files ({size} bytes) into {output}")
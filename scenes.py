@@ -0,0 +1,215 @@
+import pygame
+import os
+
+from profiler import profiler
+
+
+class DirtyRects:
+    """
+    Collects the screen regions that changed this frame so only those are
+    pushed to the display. Set `DirtyRects.full_flip = True` (or OSINT_FULL_FLIP=1)
+    to redraw and flip the whole screen every frame instead.
+    """
+    full_flip = os.environ.get("OSINT_FULL_FLIP") == "1"
+
+    def __init__(self):
+        self.rects = []
+        self.full = True  # the first frame always repaints everything
+        self._values = {}
+
+    @property
+    def pending(self):
+        """ True if anything needs to be redrawn this frame. """
+        return self.full_flip or self.full or bool(self.rects)
+
+    def add(self, rect):
+        if rect:
+            self.rects.append(pygame.Rect(rect))
+
+    def add_all(self):
+        self.full = True
+
+    def watch(self, key, rect, value):
+        """ Marks `rect` dirty if `value` differs from the one seen last frame under `key`. """
+        if key not in self._values or self._values[key] != value:
+            self._values[key] = value
+            self.add(rect)
+
+    def add_sprites(self, sprites):
+        """ Marks buttons dirty, e.g. the ones whose hover state changed (covers both default and hover rects). """
+        for sprite in sprites:
+            self.add(sprite.rects[0].union(sprite.rects[1]))
+
+    def present(self):
+        """ Pushes the dirty regions (or the whole screen) to the display. """
+        if self.full_flip or self.full:
+            pygame.display.flip()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.full = False
+
+
+class Scene:
+    """
+    A persistent screen. Scenes are built once and driven by a single frame loop:
+    `update(events)` handles input for one frame and returns a navigation action (or None),
+    `draw(screen)` paints the frame. `enter()`/`exit()` run when the scene becomes or stops
+    being the top of the stack.
+    """
+
+    def __init__(self):
+        self.dirty = DirtyRects()
+
+    def enter(self):
+        self.dirty.add_all()  # something else was on screen before us
+
+    def exit(self):
+        pass
+
+    def update(self, events):
+        return None
+
+    def draw(self, screen):
+        pass
+
+    def wake_in(self):
+        """
+        Milliseconds until the scene next needs a frame without any input:
+        0 while animating, None if it is fully static until the next event.
+        """
+        return None
+
+    def render(self, screen):
+        """ Draws the frame if anything changed and presents it. """
+        with profiler.phase("draw"):
+            if self.dirty.pending:
+                self.draw(screen)
+            self.dirty.add(profiler.draw_overlay(screen))
+        with profiler.phase("flip"):
+            self.dirty.present()
+
+
+class SceneStack:
+    """ Stack of scenes; only the top one is updated and drawn. """
+
+    def __init__(self):
+        self.scenes = []
+
+    @property
+    def top(self):
+        return self.scenes[-1] if self.scenes else None
+
+    def push(self, scene):
+        if self.top:
+            self.top.exit()
+        self.scenes.append(scene)
+        scene.enter()
+
+    def pop(self):
+        scene = self.scenes.pop()
+        scene.exit()
+        if self.top:
+            self.top.enter()
+        return scene
+
+    def goto(self, scene):
+        """ Returns to `scene` if it is already on the stack, otherwise pushes it. """
+        if scene not in self.scenes:
+            self.push(scene)
+            return
+        if scene is self.top:
+            return
+        self.top.exit()
+        while self.scenes[-1] is not scene:
+            self.scenes.pop()
+        scene.enter()
+
+    def clear(self):
+        """ Exits the top scene and empties the stack, e.g. on quit, so pending work such as an award is saved. """
+        if self.top:
+            self.top.exit()
+        self.scenes = []
+
+
+class FrameScheduler:
+    """
+    Paces the frame loop. While something is animating it runs at `fps`; otherwise it
+    blocks on pygame.event.wait until input arrives or the scene's next timer is due,
+    so static screens cost no CPU. Set OSINT_NO_IDLE=1 to always run at full rate.
+    """
+    idle_enabled = os.environ.get("OSINT_NO_IDLE") != "1"
+
+    def __init__(self, fps=60, max_idle_ms=1000):
+        self.fps = fps
+        self.max_idle_ms = max_idle_ms
+        self.clock = pygame.time.Clock()
+        self.skipped = 0  # frames not rendered because the loop was idle
+        self._pending = []  # event that woke us up, handed out by the next get_events()
+
+    def get_events(self):
+        events = self._pending + pygame.event.get()
+        self._pending = []
+        return events
+
+    def tick(self, wake_in=0):
+        """ Waits for the next frame and returns the milliseconds since the last one. """
+        if wake_in == 0 or not self.idle_enabled:
+            return self.clock.tick(self.fps)
+
+        frame_ms = 1000 / self.fps
+        timeout = self.max_idle_ms if wake_in is None else min(wake_in, self.max_idle_ms)
+        if timeout > frame_ms:
+            start = pygame.time.get_ticks()
+            event = pygame.event.wait(int(timeout))
+            if event.type != pygame.NOEVENT:
+                self._pending.append(event)
+            skipped = max(0, int((pygame.time.get_ticks() - start) / frame_ms) - 1)
+            self.skipped += skipped
+            profiler.count_skipped(skipped)
+            self.clock.tick()  # don't count the wait as frame time
+            return 0
+        return self.clock.tick(self.fps)
+
+
+def soonest(*wake_ins):
+    """ Combines several wake_in() values: the smallest one, or None if none of them need a wake-up. """
+    waits = [w for w in wake_ins if w is not None]
+    return min(waits) if waits else None
+
+
+def run_scene(screen, scene, quit_action=None, fps=60):
+    """
+    Runs one scene in its own loop until it returns an action, which is returned.
+    Scenes returned as actions are run nested, like the old blocking screen functions.
+    """
+    scheduler = FrameScheduler(fps)
+    scene.enter()
+    while True:
+        profiler.begin_frame()
+        try: # every frame is closed, including the one that leaves the loop
+            with profiler.phase("events"):
+                events = scheduler.get_events()
+            if any(event.type == pygame.QUIT for event in events):
+                scene.exit()
+                return quit_action
+            if profiler.handle(events):
+                scene.dirty.add_all()
+
+            with profiler.phase("update"):
+                action = scene.update(events)
+            if action is None:
+                scene.render(screen)
+            else:
+                scene.exit()
+        finally:
+            profiler.end_frame()
+
+        if isinstance(action, Scene): # run after this frame has ended, so it gets frames of its own
+            if run_scene(screen, action, quit_action, fps) == quit_action:
+                return quit_action
+            scene.enter()
+            continue
+        if action is not None:
+            return action
+        scheduler.tick(scene.wake_in())
@@ -1,26 +1,58 @@
 from game import *
 from challenges import TextInput
 
-def title_screen(screen, sound=None):
+CITY_BUTTONS = {
+    "portland": 'assets/buttons/portland_button.png',
+    "eugene": 'assets/buttons/eugene_button.png',
+    "corvallis": 'assets/buttons/corvallis_button.png',
+}
+MAP_ROWS = 3  # city buttons per column on the map
+
+
+class ScreenScenes:
+    """
+    Builds each screen's scene the first time it is needed and reuses it afterwards.
+    Screens are keyed by GameState, and cities by their name in the level manifest.
+    """
+
+    def __init__(self, player, sound=None):
+        self.player = player
+        self.sound = sound
+        self._scenes = {}
+
+    def get(self, state):
+        scene = self._scenes.get(state)
+        if scene is None:
+            scene = self._scenes[state] = self._build(state)
+        return scene
+
+    def _build(self, state):
+        if state == GameState.TITLE:
+            return title_scene(self.sound)
+        if state == GameState.NEWGAME:
+            return play_level_scene(self.player, self.sound)
+        if state in registry.cities():
+            return city_scene(state, self.player, self.sound)
+        raise ValueError(f"No scene for {state}")
+
+
+def title_scene(sound=None):
     quit_button = Button(200, 400, 'assets/buttons/quit_button.png', 2, action=GameState.QUIT)
     begin_button = Button(450, 400, 'assets/buttons/begin_button.png', 2, action=GameState.NEWGAME)
 
     buttons = RenderUpdates(quit_button, begin_button)
 
-    title_font = pygame.font.Font("assets/ByteBounce.ttf", 72)
-    subtitle_font = pygame.font.Font("assets/ByteBounce.ttf", 28)
-
     def draw_title(screen):
-        title = title_font.render("OSINT CHRISTMAS", True, (255, 255, 255))
-        subtitle = subtitle_font.render("Open-Source Intelligence Challenge", True, (180, 180, 180))
+        title = assets.text("OSINT CHRISTMAS", 72, (255, 255, 255))
+        subtitle = assets.text("Open-Source Intelligence Challenge", 28, (180, 180, 180))
 
         screen.blit(title, title.get_rect(center=(WIDTH // 2, 140)))
         screen.blit(subtitle, subtitle.get_rect(center=(WIDTH // 2, 200)))
 
-    return game_loop(screen, buttons, sound, draw_extra=draw_title)
+    return MenuScene(buttons, sound, draw_extra=draw_title)
 
 
-def play_level(screen, player, sound=None):
+def play_level_scene(player, sound=None):
     return_btn = UIElement(
         center_position=(140, 570),
         font_size=20,
@@ -30,40 +62,48 @@ def play_level(screen, player, sound=None):
         action=GameState.TITLE,
     )
 
-    portland_btn = Button(300, 100, 'assets/buttons/portland_button.png', 2, action=GameState.PORTLAND)
-    eugene_btn = Button(300, 250, 'assets/buttons/eugene_button.png', 2, action=GameState.EUGENE)
-    corvallis_btn = Button(300, 400, 'assets/buttons/corvallis_button.png', 2, action=GameState.CORVALLIS)
-
-    buttons = RenderUpdates(return_btn, portland_btn, eugene_btn, corvallis_btn)
-    return game_loop(screen, buttons, sound, draw_extra=lambda s: coin_banner(s, player))
-
-
-def portland_screen(screen, player, sound=None):
-    background_image = pygame.image.load(os.path.join('assets/background_images/portland_pixel.png')).convert()
-    background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))
-
-    return_btn = UIElement(
-        center_position=(140, 570),
+    export_btn = UIElement(
+        center_position=(650, 570),
         font_size=20,
-        bg_rgb=None,
+        bg_rgb=BLACK,
         text_rgb=WHITE,
-        text="<--- Return to menu",
-        action=GameState.NEWGAME,
+        text="Download all levels",
+        action=GameState.DOWNLOAD,
     )
 
-    levels = load_city_levels("portland")
-    level_boxes = RenderUpdates()
-
-    level_display(sound, level_boxes, levels, player, "portland")
-
-    buttons = RenderUpdates(return_btn)
-    return game_loop(screen, buttons, sound, background_image, city="portland", level_boxes=level_boxes, levels=levels, draw_extra=lambda s: coin_banner(s, player), player=player)
+    buttons = RenderUpdates(return_btn, *city_buttons(registry.cities()), export_btn)
+    warm_city_backgrounds() # clicking a city shouldn't have to decode its background
+    all_levels = lambda: [level for city in registry.cities() for level in registry.levels(city)]
+    return MenuScene(buttons, sound, draw_extra=lambda s: coin_banner(s, player), player=player,
+                     export_name="osint_all_levels", export_levels=all_levels)
+
+
+def city_buttons(cities):
+    """
+    One map button per city, in columns of MAP_ROWS. Clicking one returns the city's name.
+    Cities without button art get a text button, so a city only has to be in the manifest.
+    """
+    columns = (len(cities) + MAP_ROWS - 1) // MAP_ROWS
+    buttons = []
+    for i, city in enumerate(cities):
+        column, row = divmod(i, MAP_ROWS)
+        x, y = 300 + (2 * column - columns + 1) * 125, 100 + row * 150 # top left, as the art buttons are placed
+        if city in CITY_BUTTONS:
+            buttons.append(Button(x, y, CITY_BUTTONS[city], 2, action=city))
+        else:
+            buttons.append(UIElement(
+                center_position=(x + 100, y + 28),
+                font_size=40,
+                bg_rgb=BLACK,
+                text_rgb=WHITE,
+                text=city.title(),
+                action=city,
+            ))
+    return buttons
 
 
-def eugene_screen(screen, player, sound=None):
-    coin_banner(screen, player)
-    background_image = pygame.image.load(os.path.join('assets/background_images/eugene_pixel.png')).convert()
-    background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))     # Scale the image to fit the window size
+def city_scene(city, player, sound=None):
+    background_image = city_background(city)
 
     return_btn = UIElement(
         center_position=(140, 570),
@@ -74,72 +114,53 @@ def eugene_screen(screen, player, sound=None):
         action=GameState.NEWGAME,
     )
 
-    levels = load_city_levels("eugene")
-    level_boxes = RenderUpdates()
+    levels = load_city_levels(city)
+    grid = LevelGrid(levels, sound) # scrolls once a city has more levels than fit
 
-    level_display(sound, level_boxes, levels, player, "eugene")
-
-    buttons = RenderUpdates(return_btn)
-    return game_loop(screen, buttons, sound, background_image, city="eugene" , level_boxes=level_boxes, levels=levels, draw_extra=lambda s: coin_banner(s, player), player=player)
-
-
-def corvallis_screen(screen, player, sound=None):
-    coin_banner(screen, player)
-    background_image = pygame.image.load(os.path.join('assets/background_images/corvallis_pixel.png')).convert()
-    background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))     # Scale the image to fit the window size
-
-    return_btn = UIElement(
-        center_position=(140, 570),
+    export_btn = UIElement(
+        center_position=(650, 570),
         font_size=20,
         bg_rgb=None,
         text_rgb=WHITE,
-        text="<--- Return to menu",
-        action=GameState.NEWGAME,
+        text="Download all levels",
+        action=GameState.DOWNLOAD,
     )
 
-    levels = load_city_levels("corvallis")
-    level_boxes = RenderUpdates()
+    buttons = RenderUpdates(return_btn, export_btn)
+    return MenuScene(buttons, sound, background_image, city=city, grid=grid, draw_extra=lambda s: coin_banner(s, player), player=player,
+                     export_name=f"osint_{city}_levels", export_levels=lambda: levels)
 
-    level_display(sound, level_boxes, levels, player, "corvallis")
 
-    buttons = RenderUpdates(return_btn)
-    return game_loop(screen, buttons, sound, background_image, city="corvallis", level_boxes=level_boxes, levels=levels, draw_extra=lambda s: coin_banner(s, player), player=player)
+# Blocking versions of each screen, for tools that drive a single screen
+def title_screen(screen, sound=None):
+    return run_menu(screen, title_scene(sound))
 
 
-def level_display(sound, level_boxes, levels, player, city):
-    ''' Helper function for level screens, displays level boxes in grid '''
-    ICON_SIZE = 160
-    GAP_X = 40
-    GAP_Y = 40
-    START_X = 120
-    START_Y = 100
+def play_level(screen, player, sound=None):
+    return run_menu(screen, play_level_scene(player, sound))
 
-    for i, level in enumerate(levels):
-        if i < 3:
-            col, row = i, 0
-        else:
-            col, row = i - 3, 1
 
-        x = START_X + col * (ICON_SIZE + GAP_X)
-        y = START_Y + row * (ICON_SIZE + GAP_Y)
+def portland_screen(screen, player, sound=None):
+    return run_menu(screen, city_scene("portland", player, sound))
+
 
-        # Use Button for level icons so hover/click behavior is shared
-        btn = Button(x, y, f"assets/level_icons/level_{level.level_id}.png", size=(ICON_SIZE, ICON_SIZE), action=level.level_id, unlocked=True,)
-        level_boxes.add(btn)
+def eugene_screen(screen, player, sound=None):
+    return run_menu(screen, city_scene("eugene", player, sound))
+
+
+def corvallis_screen(screen, player, sound=None):
+    return run_menu(screen, city_scene("corvallis", player, sound))
 
 
 def coin_banner(screen, player):
     ''' Displays coin banner at top of screen '''
-    pygame.draw.rect(screen, (0, 0, 0), (0, 0, WIDTH, 47)) # banner
-    coin_img = pygame.image.load('assets/coin.png').convert_alpha()
-    coin_img = pygame.transform.smoothscale(coin_img, (30, 30))
+    pygame.draw.rect(screen, (0, 0, 0), BANNER_RECT) # banner
+    coin_img = assets.image('assets/coin.png', size=(30, 30), smooth=True)
     screen.blit(coin_img, (WIDTH - 50, 9))
     
-    font = pygame.font.Font("assets/ByteBounce.ttf", 24)
-    coin_text = font.render(f"Coins: {player.points}", True, (255, 255, 255))
-    player_text = font.render(f"Player: {player.name}", True, (255, 255, 255))
+    player_text = assets.text(f"Player: {player.name}", 24, (255, 255, 255))
     screen.blit(player_text, (20, 15))
-    screen.blit(coin_text, (WIDTH - 180, 15))
+    assets.glyphs(24, (255, 255, 255)).draw(screen, f"Coins: {player.points}", (WIDTH - 180, 15)) # changes often
 
 
 # def character_screen(screen, sound=None):
@@ -154,7 +175,7 @@ def coin_banner(screen, player):
 #     )
 
 #     buttons = RenderUpdates(return_btn)
-#     return game_loop(screen, buttons, sound)
+#     return run_menu(screen, MenuScene(buttons, sound))
 
 
 # def name_entry_screen(screen, player, sound=None):
@@ -0,0 +1,84 @@
+import pygame
+import threading
+
+from asset_cache import assets
+from profiler import profiler
+from scenes import Scene
+
+SPLASH_TITLE = "Christmas OSINT Adventure"
+BAR_RECT = pygame.Rect(250, 330, 300, 12)
+STATUS_RECT = pygame.Rect(200, 350, 400, 20)
+
+
+class BackgroundLoader:
+    """
+    Runs named loading steps in order on a background thread while the splash is up.
+    Each step's return value is kept in `results`; an exception stops the load and is
+    re-raised on the main thread by `result()`.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps  # [(name, fn), ...]
+        self.results = {}
+        self.current = None
+        self.completed = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="startup-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for name, fn in self.steps:
+                self.current = name
+                self.results[name] = fn()
+                self.completed += 1
+                profiler.mark(name)
+        except BaseException as e:
+            self.error = e
+        self.current = None
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return self.completed / len(self.steps) if self.steps else 1.0
+
+    def result(self):
+        """ Waits for the load to finish and returns the step results. """
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+
+class SplashScene(Scene):
+    """ Shown while a BackgroundLoader runs; only redraws the progress bar as steps finish. """
+
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+        # rendered before the loader needs the CPU, so the first frame is just blits
+        self.title = assets.text(SPLASH_TITLE, 40, (255, 255, 255))
+        self.glyphs = assets.glyphs(20, (200, 200, 200))
+
+    def wake_in(self):
+        return None if self.loader.done else 50  # poll the loader
+
+    def update(self, events):
+        self.dirty.watch("progress", BAR_RECT.union(STATUS_RECT), (self.loader.completed, self.loader.current))
+        return None
+
+    def draw(self, screen):
+        screen.fill((0, 0, 0))
+        screen.blit(self.title, self.title.get_rect(center=(400, 270)))
+
+        pygame.draw.rect(screen, (80, 80, 80), BAR_RECT, 1)
+        filled = BAR_RECT.inflate(-4, -4)
+        filled.width = int(filled.width * self.loader.progress)
+        pygame.draw.rect(screen, (255, 255, 255), filled)
+
+        status = f"Loading {self.loader.current}..." if self.loader.current else "Ready"
+        x = STATUS_RECT.centerx - self.glyphs.size(status)[0] // 2
+        self.glyphs.draw(screen, status, (x, STATUS_RECT.y))
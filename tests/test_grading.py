@@ -0,0 +1,58 @@
+import json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import grade, grade_batch, PROMPT_DECIMALS
+from levels import OSINTLevel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANSWERS = ["44.1175976,-123.9408846", "44.5175976,-123.9408846", "45.5236111,-122.6750000", "-33.8567844,151.2152967"]
+
+
+def shipped_answers():
+    """ Inline answers from the manifest, plus the solution files that are present. """
+    answers = list(ANSWERS)
+    with open(os.path.join(ROOT, "levels.json")) as f:
+        manifest = json.load(f)
+    for entry in manifest["cities"].values():
+        for spec in entry["levels"]:
+            path = os.path.join(ROOT, spec.get("solution", ""))
+            if spec.get("answer"):
+                answers.append(spec["answer"])
+            elif os.path.isfile(path):
+                with open(path) as f:
+                    answers.append(f.readline().strip())
+    return answers
+
+
+def rounded(answer, decimals):
+    lat, lon = (float(part) for part in answer.split(","))
+    return f"{lat:.{decimals}f},{lon:.{decimals}f}"
+
+
+def test_answer_rounded_to_prompted_precision_passes():
+    for answer in shipped_answers():
+        level = OSINTLevel("test", 1, answer=answer)
+        assert grade(rounded(answer, PROMPT_DECIMALS), level), answer
+
+
+def test_finer_answers_pass():
+    for answer in ANSWERS:
+        level = OSINTLevel("test", 1, answer=answer)
+        assert grade(rounded(answer, 5), level)
+        assert grade(answer, level)
+
+
+def test_coarse_or_wrong_answers_fail():
+    level = OSINTLevel("test", 1, answer="44.1175976,-123.9408846")
+    assert not grade("44,-124", level)  # fewer decimals than asked doesn't widen the radius
+    assert not grade("44.12,-123.94", level)
+    assert not grade("44.121,-123.941", level)  # off by one in the last prompted digit
+    assert not grade("not a coordinate", level)
+
+
+def test_grade_batch_matches_grade():
+    level = OSINTLevel("test", 1, answer="44.1175976,-123.9408846")
+    submissions = ["44.118,-123.941", "44.121,-123.941", "junk"]
+    correct, _ = grade_batch(submissions, [level] * len(submissions))
+    assert [bool(c) for c in correct] == [grade(s, level) for s in submissions]
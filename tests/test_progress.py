@@ -0,0 +1,84 @@
+import json, os, sys, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from progress import ProgressDB
+from game import Player
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ProgressDB(str(tmp_path / "progress.db"))
+    yield db
+    db.close()
+
+
+def blocked_writer(db):
+    """ Holds the writer thread until the returned event is set, so writes can be queued up behind it. """
+    release = threading.Event()
+    db.submit(release.wait)
+    return release
+
+
+def test_award_only_once(db):
+    profile_id = db.create_profile("elf", 100)
+    assert db.award(profile_id, "portland", 1, 1000)
+    assert not db.award(profile_id, "portland", 1, 1000)
+    assert db.profile(profile_id)["points"] == 1100
+    assert db.completed_levels(profile_id) == {"portland": {1}}
+
+
+def test_complete_level_only_once(db):
+    player = Player(db, db.create_profile("elf"))
+    assert player.complete_level(1, "portland", 1000)
+    assert not player.complete_level(1, "portland", 1000)
+    player.flush()
+    assert player.points == db.profile(player.profile_id)["points"] == 1000
+
+
+@pytest.mark.parametrize("save_first", [True, False])
+def test_save_game_with_a_pending_award(db, save_first):
+    player = Player(db, db.create_profile("elf", 100))
+    writes = []
+    update_profile = db.update_profile
+    db.update_profile = lambda *args: (writes.append(args), update_profile(*args))
+
+    release = blocked_writer(db)
+    if save_first:
+        player.save_game()
+    player.complete_level(1, "portland", 1000)
+    player.name = "santa"
+    player.save_game()
+    player.save_game()
+    release.set()
+    player.flush()
+
+    assert len(writes) == 1  # queued saves share one write
+    row = db.profile(player.profile_id)
+    assert (row["name"], row["points"]) == ("santa", 1100)
+    assert player.points == 1100
+
+
+def test_reads_while_writing(db):
+    profile_id = db.create_profile("elf")
+    for level_id in range(200):
+        db.submit(db.award, profile_id, "portland", level_id, 1)
+    while db.profile(profile_id)["points"] < 200:
+        assert len(db.profiles()) == 1
+        db.completions_per_city(profile_id)
+    db.wait()
+    assert db.completions_per_city(profile_id) == {"portland": 200}
+
+
+def test_import_json_once(db, tmp_path):
+    path = tmp_path / "save_data.json"
+    path.write_text(json.dumps({"save_file": {"points": 2000, "name": "elf",
+                                              "levels": {"portland": {"1": "completed", "2": "locked"}}}}))
+    profile_id = db.import_json(str(path))
+    assert profile_id is not None
+    assert db.import_json(str(path)) is None
+    assert len(db.profiles()) == 1
+    assert db.profile(profile_id)["points"] == 2000
+    assert db.completed_levels(profile_id) == {"portland": {1}}
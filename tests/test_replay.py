@@ -0,0 +1,80 @@
+import json, os, struct, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+from replay import EVENT_FIELDS, EVENTS, MAGIC, MOVED, VERSION, InputReplayer, decode_event, encode_event
+
+SAMPLES = {
+    pygame.QUIT: {},
+    pygame.VIDEOEXPOSE: {},
+    pygame.VIDEORESIZE: {"size": (1024, 768)},
+    pygame.MOUSEMOTION: {"pos": (400, 300), "rel": (-12, -3), "buttons": (1, 0, 1)},
+    pygame.MOUSEBUTTONDOWN: {"pos": (0, 599), "button": 1},
+    pygame.MOUSEBUTTONUP: {"pos": (799, 0), "button": 3},
+    pygame.MOUSEWHEEL: {"x": 0, "y": -2, "flipped": 1},
+    pygame.KEYDOWN: {"key": pygame.K_RETURN, "mod": pygame.KMOD_LSHIFT, "scancode": 40, "unicode": "é"},
+    pygame.KEYUP: {"key": pygame.K_BACKSPACE, "mod": 0, "scancode": 42},
+    pygame.TEXTINPUT: {"text": "ß°→"},
+}
+
+
+def test_every_logged_event_type_has_a_sample():
+    assert set(SAMPLES) == set(EVENT_FIELDS)
+
+
+def encoded(event_type, attrs):
+    out = bytearray()
+    encode_event(pygame.event.Event(event_type, attrs), out)
+    return bytes(out)
+
+
+def test_events_round_trip():
+    for event_type, attrs in SAMPLES.items():
+        out = encoded(event_type, attrs)
+        event, offset = decode_event(out, 0)
+        assert offset == len(out)
+        assert event.type == event_type
+        for name, value in attrs.items():
+            assert getattr(event, name) == value, (pygame.event.event_name(event_type), name)
+
+
+def test_resize_gets_width_and_height():
+    event, _ = decode_event(encoded(pygame.VIDEORESIZE, {"size": (1024, 768)}), 0)
+    assert (event.w, event.h) == (1024, 768)
+
+
+def write_log(path, ticks, pos, frames):
+    """ Writes a log in InputRecorder's format; `frames` is [(dt, new pos or None, [event, ...])]. """
+    header = json.dumps({"ticks": ticks, "pos": pos, "player": {"name": "", "points": 0, "levels": {}}}).encode("utf-8")
+    out = bytearray(MAGIC + struct.pack("<BI", VERSION, len(header)) + header)
+    for dt, moved, events in frames:
+        out += struct.pack("<BH", (MOVED if moved else 0) | (EVENTS if events else 0), dt)
+        if moved:
+            out += struct.pack("<hh", *moved)
+        if events:
+            out += struct.pack("<H", len(events))
+            for event in events:
+                encode_event(event, out)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def test_frames_decode(tmp_path):
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(20, 30), button=1)
+    key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a, mod=0, scancode=4, unicode="a")
+    path = str(tmp_path / "session.osr")
+    write_log(path, 5000, (1, 2), [
+        (16, None, []),              # nothing happened
+        (17, (20, 30), []),          # MOVED only
+        (0, None, [click]),          # EVENTS only
+        (65535, (-5, 700), [click, key]),
+    ])
+
+    frames = InputReplayer(path).frames
+    assert [(ticks, pos) for ticks, pos, _ in frames] == [
+        (5016, (1, 2)), (5033, (20, 30)), (5033, (20, 30)), (5033 + 65535, (-5, 700))]
+    assert [[event.type for event in events] for _, _, events in frames] == [
+        [], [], [pygame.MOUSEBUTTONDOWN], [pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN]]
+    assert frames[3][2][1].unicode == "a"
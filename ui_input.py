@@ -0,0 +1,110 @@
+import pygame
+
+CELL_SIZE = 64
+
+
+class SpatialHash:
+    """ A uniform grid of `cell_size` squares, each listing the items whose rect overlaps it. """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}  # (cx, cy) -> [item, ...]
+        self._items = {}  # item -> (rect, order added)
+        self._count = 0
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield cx, cy
+
+    def insert(self, item, rect):
+        rect = pygame.Rect(rect)
+        if item in self._items:
+            self.remove(item)
+        self._items[item] = (rect, self._count)
+        self._count += 1
+        for cell in self._cell_range(rect):
+            self._cells.setdefault(cell, []).append(item)
+
+    def remove(self, item):
+        rect, _ = self._items.pop(item)
+        for cell in self._cell_range(rect):
+            bucket = self._cells[cell]
+            bucket.remove(item)
+            if not bucket:
+                del self._cells[cell]
+
+    def query_point(self, pos):
+        """ Items whose rect contains `pos`, in the order they were inserted. """
+        bucket = self._cells.get((int(pos[0]) // self.cell_size, int(pos[1]) // self.cell_size), ())
+        hits = [item for item in bucket if self._items[item][0].collidepoint(pos)]
+        hits.sort(key=lambda item: self._items[item][1])
+        return hits
+
+    def __len__(self):
+        return len(self._items)
+
+
+_DEFAULT = object()
+
+
+class UIInput:
+    """
+    Hover and click dispatch for a screen's buttons (anything with `update(mouse_pos,
+    mouse_up, sound)`, `rects` and `mouse_over`, i.e. UIElement and Button).
+    Elements are indexed by the area they can cover, default and hover rect, in a
+    SpatialHash. `update()` does nothing unless the mouse moved or clicked, and then
+    only asks the elements under the pointer plus the one it was last over.
+    """
+
+    def __init__(self, elements=(), sound=None, cell_size=CELL_SIZE):
+        self.sound = sound  # played on click unless an element has its own (see add)
+        self.index = SpatialHash(cell_size)
+        self.sounds = {}  # element -> sound, for elements that differ from `sound`
+        self.hovered = []  # elements that were under the pointer last update
+        self.changed = []  # elements whose hover state changed in the last update
+        self._last_pos = None
+        for element in elements:
+            self.add(element)
+
+    def add(self, element, sound=_DEFAULT):
+        self.index.insert(element, element.rects[0].union(element.rects[1]))
+        if sound is not _DEFAULT:
+            self.sounds[element] = sound
+
+    def remove(self, element):
+        self.index.remove(element)
+        self.sounds.pop(element, None)
+        if element in self.hovered:
+            self.hovered.remove(element)
+
+    def reset(self):
+        """ Forget the pointer position, so the next update re-checks hover (e.g. when a screen is re-entered). """
+        self._last_pos = None
+
+    def update(self, events, mouse_pos=None):
+        """ Dispatches hover and click to the elements under the pointer; returns the clicked element's action. """
+        self.changed = []
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        mouse_up = any(event.type == pygame.MOUSEBUTTONUP and event.button == 1 for event in events)
+        if mouse_pos == self._last_pos and not mouse_up:
+            return None
+        self._last_pos = mouse_pos
+
+        candidates = self.index.query_point(mouse_pos)
+        for element in self.hovered: # so it can notice the pointer left
+            if element not in candidates:
+                candidates.append(element)
+
+        action = None
+        for element in candidates:
+            was_over = element.mouse_over
+            action = element.update(mouse_pos, mouse_up, self.sounds.get(element, self.sound))
+            if element.mouse_over != was_over:
+                self.changed.append(element)
+            if action is not None: # like the old loop, the first clicked element wins
+                break
+        self.hovered = [element for element in candidates if element.mouse_over]
+        return action